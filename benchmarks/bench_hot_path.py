@@ -0,0 +1,78 @@
+"""Pure-Python per-message hot path: webhook normalization, lock keys, trimming, reply splitting."""
+
+import json
+from pathlib import Path
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from harness import benchmark
+from whatsapp_agent.db.locks import _chat_id_to_lock_key
+from whatsapp_agent.graphs.whatsapp_bot.graph import trim_history
+from whatsapp_agent.integrations import normalize_webhook_payload
+from whatsapp_agent.workers.process_chat import split_reply, typing_duration_ms
+
+PAYLOADS = json.loads((Path(__file__).parent / "payloads.json").read_text())
+
+
+def _history(length: int) -> list:
+    """Alternating user/assistant history of the given length."""
+    return [
+        HumanMessage(content=f"user message {i} about the meeting tomorrow", id=f"h{i}")
+        if i % 2 == 0
+        else AIMessage(content=f"sure thing ||| checking now {i}", id=f"a{i}")
+        for i in range(length)
+    ]
+
+
+HISTORY_100 = _history(100)
+HISTORY_2000 = _history(2000)
+
+REPLY_SHORT = "sure thing"
+REPLY_MULTI = "okay got it ||| i'll let him know ||| he should be free after 4 |||  "
+REPLY_LONG = " ||| ".join(["so the plan is we meet at the office then head over together"] * 6)
+
+
+for _name, _payload in PAYLOADS.items():
+    benchmark(f"normalize[{_name}]")(lambda p=_payload: normalize_webhook_payload(p))
+
+
+@benchmark("normalize[corpus]")
+def normalize_corpus():
+    for payload in PAYLOADS.values():
+        normalize_webhook_payload(payload)
+
+
+@benchmark("lock_key[dm]")
+def lock_key_dm():
+    _chat_id_to_lock_key("971501234567@s.whatsapp.net")
+
+
+@benchmark("lock_key[group]")
+def lock_key_group():
+    _chat_id_to_lock_key("120363025555555555@g.us")
+
+
+@benchmark("trim_history[100]")
+def trim_100():
+    trim_history(HISTORY_100)
+
+
+@benchmark("trim_history[2000]")
+def trim_2000():
+    trim_history(HISTORY_2000)
+
+
+@benchmark("split_reply[short]")
+def split_short():
+    split_reply(REPLY_SHORT)
+
+
+@benchmark("split_reply[multi]")
+def split_multi():
+    split_reply(REPLY_MULTI)
+
+
+@benchmark("reply_plan[long]")
+def reply_plan_long():
+    for part in split_reply(REPLY_LONG):
+        typing_duration_ms(part)
@@ -0,0 +1,117 @@
+"""
+Event-loop cost of hot-path logging: f-string lines on a stream handler vs
+lazy structured events on a queue handler (formatted by a listener thread).
+"""
+
+import asyncio
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import time
+
+from harness import benchmark, report
+from whatsapp_agent.logs import DeferredQueueHandler, MessageText, StructuredFormatter, log_event
+from whatsapp_agent.settings import settings
+
+CHAT_ID = "971501234567@s.whatsapp.net"
+TEXT = "hey can we move tomorrow's meeting to 3pm? same place as last time"
+REPLY = "sure thing, i'll let him know and get back to you"
+
+# Simulated load: messages handled concurrently, reply parts per message
+LOAD_MESSAGES = 2000
+LOAD_PARTS = 2
+
+_devnull = open(os.devnull, "w")
+atexit.register(_devnull.close)
+
+# Previous setup: synchronous stream handler, message formatted by the caller
+legacy_logger = logging.getLogger("bench.logging.legacy")
+_legacy_handler = logging.StreamHandler(_devnull)
+_legacy_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+legacy_logger.addHandler(_legacy_handler)
+legacy_logger.setLevel(logging.INFO)
+legacy_logger.propagate = False
+
+# New setup: records queued as-is; a listener thread formats and writes
+structured_logger = logging.getLogger("bench.logging.structured")
+_queue: queue.SimpleQueue = queue.SimpleQueue()
+_structured_handler = logging.StreamHandler(_devnull)
+_structured_handler.setFormatter(StructuredFormatter())
+structured_logger.addHandler(DeferredQueueHandler(_queue))
+structured_logger.setLevel(logging.INFO)
+structured_logger.propagate = False
+_listener = logging.handlers.QueueListener(_queue, _structured_handler)
+_listener.start()
+atexit.register(_listener.stop)
+
+settings.log_sample_rates["bench.sampled_out"] = 0.0
+
+
+@benchmark("log[fstring,stream]")
+def log_fstring_stream():
+    legacy_logger.info(f"Received message from {CHAT_ID} (from_me={False}): {TEXT[:50]}...")
+
+
+@benchmark("log[event,queue]")
+def log_event_queue():
+    log_event(structured_logger, "bench.received", chat_id=CHAT_ID, from_me=False, text=MessageText(TEXT))
+
+
+@benchmark("log[event,sampled_out]")
+def log_event_sampled_out():
+    log_event(structured_logger, "bench.sampled_out", chat_id=CHAT_ID, from_me=False, text=MessageText(TEXT))
+
+
+def _legacy_message() -> None:
+    """The per-message lines routes_evolution and process_chat used to emit."""
+    legacy_logger.info(f"Received message from {CHAT_ID} (from_me={False}): {TEXT[:50]}...")
+    legacy_logger.info(f"Processing {1} messages for {CHAT_ID}, last_is_from_me={False}")
+    legacy_logger.info(f"Running graph for {CHAT_ID} with {1} message(s): {TEXT[:50]}...")
+    for idx in range(LOAD_PARTS):
+        legacy_logger.info(f"Typing part {idx+1}/{LOAD_PARTS} for {2450}ms based on {len(REPLY)} chars (pulsing)")
+        legacy_logger.info(f"Sent reply part {idx+1} to {CHAT_ID}: {REPLY[:50]}...")
+        legacy_logger.info(f"Human pause for {812.4:.0f}ms")
+
+
+def _structured_message() -> None:
+    """The same lines as structured events, with the default sample rates."""
+    log_event(structured_logger, "webhook.received", chat_id=CHAT_ID, from_me=False, text=MessageText(TEXT))
+    log_event(structured_logger, "chat.batch", chat_id=CHAT_ID, messages=1, last_is_from_me=False)
+    log_event(structured_logger, "chat.graph_run", chat_id=CHAT_ID, messages=1, text=MessageText(TEXT))
+    for idx in range(LOAD_PARTS):
+        log_event(structured_logger, "reply.typing", chat_id=CHAT_ID, part=idx + 1, parts=LOAD_PARTS, duration_ms=2450)
+        log_event(structured_logger, "reply.part_sent", chat_id=CHAT_ID, part=idx + 1, text=MessageText(REPLY))
+        log_event(structured_logger, "reply.pause", chat_id=CHAT_ID, pause_ms=812)
+
+
+def _loop_seconds(log_message) -> float:
+    """Event-loop time spent logging for LOAD_MESSAGES concurrent message tasks."""
+    spent = 0.0
+
+    async def handle() -> None:
+        nonlocal spent
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        log_message()
+        spent += time.perf_counter() - start
+
+    async def run() -> None:
+        await asyncio.gather(*(handle() for _ in range(LOAD_MESSAGES)))
+
+    asyncio.run(run())
+    return spent
+
+
+@report
+def logging_loop_time() -> dict:
+    """Event-loop milliseconds spent on logging per 1000 messages (best of 5)."""
+    legacy = min(_loop_seconds(_legacy_message) for _ in range(5))
+    structured = min(_loop_seconds(_structured_message) for _ in range(5))
+    scale = 1000 / LOAD_MESSAGES * 1000
+    return {
+        "loop_ms_per_1k_msgs[fstring,stream]": round(legacy * scale, 2),
+        "loop_ms_per_1k_msgs[event,queue]": round(structured * scale, 2),
+        "loop_time_saved": f"{1 - structured / legacy:.0%}",
+    }
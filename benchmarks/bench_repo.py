@@ -0,0 +1,122 @@
+"""Repository functions the webhook and worker call, against a local Postgres (enabled with --db)."""
+
+import itertools
+from datetime import datetime, timezone
+
+from harness import benchmark
+from whatsapp_agent.db import (
+    add_chat_stats,
+    close_pool,
+    complete_reply_plan,
+    create_reply_plan,
+    fetch_unprocessed_messages,
+    get_chat_cadence,
+    get_conn,
+    get_last_message,
+    get_pending_reply_plan,
+    init_outbound_bucket,
+    init_pool,
+    insert_inbound_message,
+    mark_messages_processed,
+    mark_reply_part_attempted,
+    mark_reply_part_delivered,
+    take_outbound_token,
+    upsert_chat_cadence,
+)
+
+# Seeded batch read by the fetch/debounce benchmarks; writes go to other chats
+CHAT_ID = "bench:971501234567@s.whatsapp.net"
+WRITE_CHAT_ID = "bench:971509876543@s.whatsapp.net"
+SEEDED_MESSAGES = 20
+BUCKET_INSTANCE = "bench"
+
+_counter = itertools.count()
+_processed_ids: list[int] = []
+
+
+async def setup() -> None:
+    """Open the pool, clear leftovers and seed a batch of unprocessed messages."""
+    await init_pool()
+    await teardown_rows()
+    for i in range(SEEDED_MESSAGES):
+        await insert_inbound_message(CHAT_ID, f"bench-seed-{i}", f"seed message {i}")
+    await insert_inbound_message(WRITE_CHAT_ID, "bench-processed", "already handled")
+    _processed_ids.extend(m[0] for m in await fetch_unprocessed_messages(WRITE_CHAT_ID))
+    await upsert_chat_cadence(CHAT_ID, [0] * 32, datetime.now(timezone.utc), None)
+    # Effectively unlimited, so taking a token is never refused
+    await init_outbound_bucket(BUCKET_INSTANCE, 10**9, 10.0**9)
+
+
+async def teardown_rows() -> None:
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("DELETE FROM inbound_messages WHERE chat_id LIKE 'bench:%'")
+            await cur.execute("DELETE FROM outbound_messages WHERE chat_id LIKE 'bench:%'")
+            await cur.execute("DELETE FROM reply_plans WHERE chat_id LIKE 'bench:%'")
+            await cur.execute("DELETE FROM chat_cadence WHERE chat_id LIKE 'bench:%'")
+            await cur.execute("DELETE FROM chat_stats WHERE chat_id LIKE 'bench:%'")
+            await cur.execute("DELETE FROM outbound_buckets WHERE instance = %s", (BUCKET_INSTANCE,))
+        await conn.commit()
+
+
+async def teardown() -> None:
+    await teardown_rows()
+    await close_pool()
+
+
+@benchmark("repo.insert_inbound_message", group="db")
+async def bench_insert_inbound():
+    await insert_inbound_message(WRITE_CHAT_ID, f"bench-{next(_counter)}", "hey is raed around?")
+
+
+@benchmark("repo.insert_inbound_message[duplicate]", group="db")
+async def bench_insert_inbound_duplicate():
+    await insert_inbound_message(CHAT_ID, "bench-seed-0", "seed message 0")
+
+
+@benchmark("repo.get_pending_reply_plan", group="db")
+async def bench_pending_reply_plan():
+    await get_pending_reply_plan(CHAT_ID)
+
+
+@benchmark("repo.get_last_message", group="db")
+async def bench_last_message():
+    await get_last_message(CHAT_ID)
+
+
+@benchmark("repo.fetch_unprocessed_messages", group="db")
+async def bench_fetch_unprocessed():
+    await fetch_unprocessed_messages(CHAT_ID)
+
+
+@benchmark("repo.mark_messages_processed", group="db")
+async def bench_mark_processed():
+    await mark_messages_processed(_processed_ids)
+
+
+@benchmark("repo.chat_cadence[get+upsert]", group="db")
+async def bench_chat_cadence():
+    gap_histogram, last_user_message_at, answered_at = await get_chat_cadence(CHAT_ID)
+    await upsert_chat_cadence(CHAT_ID, gap_histogram, last_user_message_at, answered_at)
+
+
+@benchmark("repo.reply_plan[create+send 1 part+complete]", group="db")
+async def bench_reply_plan():
+    plan_id = await create_reply_plan(WRITE_CHAT_ID, _processed_ids, "sure thing", ["sure thing"])
+    await mark_reply_part_attempted(plan_id, 0)
+    await mark_reply_part_delivered(plan_id, 0, WRITE_CHAT_ID, "sure thing", f"bench-{next(_counter)}")
+    await complete_reply_plan(plan_id, _processed_ids)
+
+
+@benchmark("repo.add_chat_stats", group="db")
+async def bench_add_chat_stats():
+    now = datetime.now(timezone.utc)
+    await add_chat_stats(
+        WRITE_CHAT_ID, user_messages=2, replies=1, reply_parts=1,
+        last_inbound_at=now, last_reply_at=now, latency_seconds=3.0,
+    )
+
+
+@benchmark("repo.take_outbound_token", group="db")
+async def bench_take_outbound_token():
+    await take_outbound_token(BUCKET_INSTANCE, 10**9, 0.1, 10.0**9)
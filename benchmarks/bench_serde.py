@@ -0,0 +1,58 @@
+"""Checkpoint serialization: default JsonPlusSerializer vs the compact message serializer."""
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from harness import benchmark, report
+from whatsapp_agent.graphs.whatsapp_bot.serde import CompactSerializer
+
+
+def _thread(length: int) -> list:
+    """A realistic messages channel: user batches and model replies with usage metadata."""
+    messages = []
+    for i in range(length):
+        if i % 2 == 0:
+            messages.append(HumanMessage(
+                content=f"hey can we move tomorrow's meeting to {i % 12 + 1}pm? same place",
+                id=f"inbound:{1000 + i}",
+                additional_kwargs={"received_at": f"2025-01-15T10:{i % 60:02d}:04.512000+00:00"},
+            ))
+        else:
+            messages.append(AIMessage(
+                content="sure thing ||| i'll let him know and get back to you",
+                id=f"run--6f1c2d3e-{i:04d}-4a5b-8c9d-0e1f2a3b4c5d-0",
+                response_metadata={
+                    "token_usage": {"completion_tokens": 18, "prompt_tokens": 912, "total_tokens": 930, "cost": 0.00041},
+                    "model_name": "openai/gpt-5.2",
+                    "system_fingerprint": None,
+                    "id": f"gen-1736936464-{i:06d}",
+                    "finish_reason": "stop",
+                    "logprobs": None,
+                },
+                usage_metadata={"input_tokens": 912, "output_tokens": 18, "total_tokens": 930},
+            ))
+    return messages
+
+
+THREADS = {length: _thread(length) for length in (20, 200, 1000)}
+SERIALIZERS = {
+    "jsonplus": JsonPlusSerializer(),
+    "compact": CompactSerializer(compress_min_bytes=0),
+    "compact+zstd": CompactSerializer(compress_min_bytes=4096),
+}
+
+for _serde_name, _serde in SERIALIZERS.items():
+    for _length, _messages in THREADS.items():
+        _dumped = _serde.dumps_typed(_messages)
+        benchmark(f"serde.dumps[{_serde_name},{_length}]")(lambda s=_serde, m=_messages: s.dumps_typed(m))
+        benchmark(f"serde.loads[{_serde_name},{_length}]")(lambda s=_serde, d=_dumped: s.loads_typed(d))
+
+
+@report
+def checkpoint_sizes() -> dict:
+    """Bytes per messages-channel blob for each serializer and thread length."""
+    return {
+        f"bytes[{serde_name},{length}]": len(serde.dumps_typed(messages)[1])
+        for serde_name, serde in SERIALIZERS.items()
+        for length, messages in THREADS.items()
+    }
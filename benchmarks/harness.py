@@ -0,0 +1,123 @@
+"""Benchmark registry, measurement and baseline comparison."""
+
+import asyncio
+import gc
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+# Each timing round should run at least this long so timer resolution is negligible
+MIN_ROUND_SECONDS = 0.05
+ROUNDS = 5
+
+# Allocation regressions smaller than this many bytes are treated as noise
+ALLOC_SLACK_BYTES = 256
+
+
+@dataclass
+class Benchmark:
+    """A registered benchmark: a zero-arg callable (sync or async) timed per call."""
+    name: str
+    group: str
+    fn: Callable[[], Any] | Callable[[], Awaitable[Any]]
+    is_async: bool
+
+
+BENCHMARKS: list[Benchmark] = []
+
+# Extra (non-timing) measurements printed after the run, e.g. payload sizes
+REPORTS: list[Callable[[], dict[str, Any]]] = []
+
+
+def benchmark(name: str, group: str = "core"):
+    """Register a benchmark. Async functions are awaited inside one event loop run."""
+    def decorator(fn):
+        BENCHMARKS.append(Benchmark(name, group, fn, asyncio.iscoroutinefunction(fn)))
+        return fn
+    return decorator
+
+
+def report(fn: Callable[[], dict[str, Any]]) -> Callable[[], dict[str, Any]]:
+    """Register a report function returning {label: value}."""
+    REPORTS.append(fn)
+    return fn
+
+
+def _run_sync(fn: Callable[[], Any], n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return time.perf_counter() - start
+
+
+async def _run_async(fn: Callable[[], Awaitable[Any]], n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        await fn()
+    return time.perf_counter() - start
+
+
+def _timed(bench: Benchmark, n: int, loop: asyncio.AbstractEventLoop) -> float:
+    if bench.is_async:
+        return loop.run_until_complete(_run_async(bench.fn, n))
+    return _run_sync(bench.fn, n)
+
+
+def _peak_bytes(bench: Benchmark, loop: asyncio.AbstractEventLoop) -> int:
+    """Peak traced memory above the starting point for a single call."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        _timed(bench, 1, loop)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return max(peak - before, 0)
+
+
+def measure(bench: Benchmark, loop: asyncio.AbstractEventLoop) -> dict:
+    """
+    Measure one benchmark.
+    Returns best-of-ROUNDS nanoseconds per call and peak allocated bytes per call.
+    """
+    # Warm up and calibrate the number of calls per round
+    n = 1
+    while True:
+        elapsed = _timed(bench, n, loop)
+        if elapsed >= MIN_ROUND_SECONDS:
+            break
+        n *= 2 if elapsed == 0 else max(2, int(MIN_ROUND_SECONDS / elapsed) + 1)
+
+    best = min(_timed(bench, n, loop) for _ in range(ROUNDS))
+    return {
+        "ns_per_call": round(best / n * 1e9, 1),
+        "peak_bytes": _peak_bytes(bench, loop),
+        "calls_per_round": n,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Compare results against a baseline.
+    Returns human-readable regression messages (empty if within threshold).
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        time_ratio = current["ns_per_call"] / max(base["ns_per_call"], 1e-9)
+        if time_ratio > 1 + threshold:
+            regressions.append(
+                f"{name}: {current['ns_per_call']:.0f}ns/call vs baseline "
+                f"{base['ns_per_call']:.0f}ns ({time_ratio:.2f}x)"
+            )
+        alloc_limit = base["peak_bytes"] * (1 + threshold) + ALLOC_SLACK_BYTES
+        if current["peak_bytes"] > alloc_limit:
+            regressions.append(
+                f"{name}: {current['peak_bytes']}B peak/call vs baseline {base['peak_bytes']}B"
+            )
+    return regressions
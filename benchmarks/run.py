@@ -0,0 +1,128 @@
+"""
+Micro-benchmarks for the per-message hot path, with a baseline regression gate.
+
+Usage:
+    python benchmarks/run.py                    # run and compare against the baseline
+    python benchmarks/run.py --save-baseline    # record the current results as the baseline
+    python benchmarks/run.py --db               # include repository benchmarks (uses DATABASE_URL)
+    python benchmarks/run.py -k trim            # only benchmarks whose name contains "trim"
+
+Exits with status 1 if any benchmark is slower (or allocates more) than the
+baseline by more than --threshold, or has no baseline to compare against.
+Baselines are machine-specific: record and compare on the same host / CI runner.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(BENCH_DIR.parent / "src"))
+
+# Settings are loaded at import time; pure benchmarks don't need real credentials
+for _key, _value in {
+    "DATABASE_URL": "postgresql://localhost/whatsapp_agent_bench",
+    "OPENROUTER_API_KEY": "bench",
+    "EVOLUTION_API_URL": "http://localhost",
+    "EVOLUTION_API_KEY": "bench",
+    "EVOLUTION_INSTANCE": "bench",
+}.items():
+    os.environ.setdefault(_key, _value)
+
+from harness import BENCHMARKS, REPORTS, compare, measure  # noqa: E402
+
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="write results to the baseline file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=float(os.environ.get("BENCH_THRESHOLD", "0.15")),
+        help="allowed slowdown ratio before failing (default 0.15 = 15%%, env BENCH_THRESHOLD)",
+    )
+    parser.add_argument("--db", action="store_true", help="include repository benchmarks against DATABASE_URL")
+    parser.add_argument("-k", dest="keyword", default=None, help="only run benchmarks whose name contains this")
+    args = parser.parse_args()
+
+    import bench_hot_path  # noqa: F401  (registers benchmarks)
+    import bench_serde  # noqa: F401
+    import bench_logging  # noqa: F401
+    groups = {"core"}
+    if args.db:
+        import bench_repo
+        groups.add("db")
+
+    selected = [
+        b for b in BENCHMARKS
+        if b.group in groups and (args.keyword is None or args.keyword in b.name)
+    ]
+
+    loop = asyncio.new_event_loop()
+    if args.db:
+        loop.run_until_complete(bench_repo.setup())
+
+    results = {}
+    try:
+        for bench in selected:
+            result = measure(bench, loop)
+            results[bench.name] = result
+            print(f"{bench.name:<48} {result['ns_per_call']:>12.0f} ns/call {result['peak_bytes']:>10} B peak")
+    finally:
+        if args.db:
+            loop.run_until_complete(bench_repo.teardown())
+        loop.close()
+
+    if args.keyword is None:
+        for report_fn in REPORTS:
+            print()
+            for label, value in report_fn().items():
+                print(f"{label:<48} {value}")
+
+    if args.save_baseline:
+        existing = json.loads(args.baseline.read_text())["results"] if args.baseline.exists() else {}
+        existing.update(results)
+        args.baseline.write_text(json.dumps(
+            {
+                "meta": {"python": platform.python_version(), "machine": platform.machine()},
+                "results": dict(sorted(existing.items())),
+            },
+            indent=2,
+        ) + "\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return 1
+
+    baseline = json.loads(args.baseline.read_text())["results"]
+    missing = sorted(name for name in results if name not in baseline)
+    if missing:
+        # A new or renamed benchmark would otherwise never be gated
+        print(f"\n{len(missing)} benchmark(s) missing from {args.baseline}; run with --save-baseline:")
+        for name in missing:
+            print(f"  {name}")
+        return 1
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%} threshold:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+
+    print(f"\nNo regressions over {args.threshold:.0%} threshold")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,10 +9,11 @@ app = modal.App("whatsapp-agent")
 image = (
     modal.Image.debian_slim(python_version="3.12")
     .pip_install(
-        "langgraph>=0.2.0",
+        "langgraph>=0.6.0",
         "langchain-openai>=0.2.0",
         "langchain-core>=0.3.0",
         "langgraph-checkpoint-postgres>=2.0.0",
+        "ormsgpack>=1.5.0",
         "fastapi>=0.115.0",
         "uvicorn[standard]>=0.32.0",
         "httpx>=0.28.0",
@@ -20,6 +21,8 @@ image = (
         "psycopg-pool>=3.2.0",
         "pydantic-settings>=2.6.0",
         "langsmith>=0.1.0",
+        "zstandard>=0.22.0",
+        "ijson>=3.2.0",
     )
     .add_local_dir("src/whatsapp_agent", "/root/whatsapp_agent")
 )
@@ -29,6 +32,9 @@ image = (
 secrets = modal.Secret.from_name("whatsapp-agent-secrets")
 
 
+# Containers scale out freely: every outbound scheduler takes tokens from the
+# instance's shared bucket in Postgres (OUTBOUND_SHARED_BUCKET), so more
+# containers don't multiply the send rate to the Evolution instance.
 @app.function(
     image=image,
     secrets=[secrets],
@@ -54,18 +60,24 @@ async def process_chat_modal(chat_id: str):
     """
     Modal function for processing a chat.
     Can be spawned from the webhook handler for true async processing.
+
+    Not used by the webhook. Sends share the web containers' rate budget
+    through the shared outbound bucket.
     """
     import sys
     sys.path.insert(0, "/root")
     
     from whatsapp_agent.db import init_pool, close_pool
+    from whatsapp_agent.logs import configure_logging, stop_logging
     from whatsapp_agent.workers.process_chat import process_chat_task
     
+    configure_logging()
     await init_pool()
     try:
         await process_chat_task(chat_id)
     finally:
         await close_pool()
+        stop_logging()
 
 
 # For local development, you can run:
@@ -4,16 +4,26 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 from whatsapp_agent.db import init_pool, close_pool
+from whatsapp_agent.integrations import outbound_scheduler
+from whatsapp_agent.logs import configure_logging, stop_logging
+from whatsapp_agent.workers.load import load_monitor
+from whatsapp_agent.workers.process_chat import process_chat_task
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan - initialize and cleanup resources."""
     # Startup
+    configure_logging()
     await init_pool()
+    load_monitor.start(dispatch=process_chat_task)
+    outbound_scheduler.start()
     yield
     # Shutdown
+    await load_monitor.stop()
+    await outbound_scheduler.stop()
     await close_pool()
+    stop_logging()
 
 
 def create_app() -> FastAPI:
@@ -28,8 +38,10 @@ def create_app() -> FastAPI:
     # Import and include routers
     from whatsapp_agent.api.routes_evolution import router as evolution_router
     from whatsapp_agent.api.routes_health import router as health_router
+    from whatsapp_agent.api.routes_stats import router as stats_router
     
     app.include_router(health_router)
     app.include_router(evolution_router)
+    app.include_router(stats_router)
     
     return app
@@ -1,32 +1,80 @@
 """Evolution API webhook routes."""
 
+import asyncio
+import json
 import logging
+import os
+import tempfile
+
 from fastapi import APIRouter, Request, BackgroundTasks
+from fastapi.responses import JSONResponse
 
 from whatsapp_agent.db import insert_inbound_message
-from whatsapp_agent.integrations import normalize_webhook_payload
+from whatsapp_agent.integrations import normalize_webhook_payload, iter_history_messages, read_event
+from whatsapp_agent.logs import MessageText, log_event
+from whatsapp_agent.settings import settings
+from whatsapp_agent.workers.load import load_monitor, DEFER, REJECT
 from whatsapp_agent.workers.process_chat import process_chat_task
+from whatsapp_agent.workers.history_import import import_history, import_history_file
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/webhooks", tags=["webhooks"])
 
 
+# Webhook bodies up to this size are parsed in memory; larger ones (history syncs) are spooled to disk
+INLINE_BODY_BYTES = 1024 * 1024
+
+
+class BodyTooLarge(Exception):
+    """Request body over HISTORY_MAX_BODY_BYTES."""
+
+    def __init__(self, size: int):
+        super().__init__(f"{size} bytes")
+        self.size = size
+
+
 @router.post("/evolution")
 async def evolution_webhook(request: Request, background_tasks: BackgroundTasks):
     """
     Receive webhook events from Evolution API.
     
+    - Reads small bodies in memory; large ones (history syncs) are spooled to
+      a temp file and capped at HISTORY_MAX_BODY_BYTES
+    - Imports history syncs (messages.set) in the background
     - Normalizes the payload
+    - Applies admission control (reject with 503 + Retry-After when overloaded)
     - Inserts message to DB (with dedupe)
-    - Triggers background processing
+    - Triggers background processing, or defers it until load drops
     """
     try:
-        payload = await request.json()
+        body, spool_path = await read_body(request, INLINE_BODY_BYTES)
+    except BodyTooLarge as e:
+        return _too_large(e.size)
+
+    try:
+        if spool_path is not None:
+            # Check the event without loading the document; history syncs are imported from the file
+            if await asyncio.to_thread(_spooled_event, spool_path) == "messages.set":
+                log_event(logger, "webhook.history_spooled", bytes=os.path.getsize(spool_path))
+                background_tasks.add_task(_import_and_remove, spool_path)
+                return {"ok": True, "action": "history_import"}
+            payload = await asyncio.to_thread(_load_and_remove, spool_path)
+        else:
+            payload = json.loads(body)
     except Exception as e:
-        logger.error(f"Failed to parse webhook payload: {e}")
+        if spool_path is not None and os.path.exists(spool_path):
+            os.unlink(spool_path)
+        log_event(logger, "webhook.invalid_json", level=logging.ERROR, error=e)
+        return {"ok": False, "error": "Invalid JSON"}
+    if not isinstance(payload, dict):
         return {"ok": False, "error": "Invalid JSON"}
     
+    # History sync (new number connected) - bulk import in the background
+    if payload.get("event") == "messages.set":
+        background_tasks.add_task(import_history, iter_history_messages(payload))
+        return {"ok": True, "action": "history_import"}
+
     # Normalize the webhook payload
     message = normalize_webhook_payload(payload)
     
@@ -34,7 +82,24 @@ async def evolution_webhook(request: Request, background_tasks: BackgroundTasks)
         # Not a message we care about (status update, outgoing, etc.)
         return {"ok": True, "action": "ignored"}
     
-    logger.info(f"Received message from {message.chat_id} (from_me={message.from_me}): {message.text[:50]}...")
+    log_event(
+        logger,
+        "webhook.received",
+        chat_id=message.chat_id,
+        message_id=message.message_id,
+        from_me=message.from_me,
+        text=MessageText(message.text),
+    )
+
+    # Admission control - shed before touching the DB when far over capacity
+    decision = load_monitor.admission()
+    if decision == REJECT:
+        log_event(logger, "webhook.rejected", level=logging.WARNING, message_id=message.message_id)
+        return JSONResponse(
+            status_code=503,
+            content={"ok": False, "error": "overloaded"},
+            headers={"Retry-After": str(settings.shed_retry_after_seconds)},
+        )
 
     # Insert to DB (dedupe by message_id)
     inserted = await insert_inbound_message(
@@ -46,10 +111,110 @@ async def evolution_webhook(request: Request, background_tasks: BackgroundTasks)
     
     if not inserted:
         # Duplicate message (webhook retry)
-        logger.info(f"Duplicate message ignored: {message.message_id}")
+        log_event(logger, "webhook.duplicate", message_id=message.message_id)
         return {"ok": True, "action": "duplicate"}
     
+    # Persisted; start processing once load drops
+    if decision == DEFER:
+        log_event(logger, "webhook.deferred", chat_id=message.chat_id)
+        load_monitor.defer(message.chat_id)
+        return {"ok": True, "action": "deferred"}
+
     # Trigger background processing
     background_tasks.add_task(process_chat_task, message.chat_id)
     
     return {"ok": True, "action": "queued"}
+
+
+async def _import_and_remove(path: str) -> None:
+    try:
+        await import_history_file(path)
+    finally:
+        os.unlink(path)
+
+
+@router.post("/evolution/messages-set")
+async def evolution_history_webhook(request: Request, background_tasks: BackgroundTasks):
+    """
+    Receive a history sync (messages.set) when Evolution's "webhook by events" is enabled.
+
+    The body is streamed to a temp file instead of being parsed in memory,
+    then imported in the background (COPY into inbound_messages + thread seeding).
+    Bodies over HISTORY_MAX_BODY_BYTES are refused with 413.
+    """
+    try:
+        _, spool_path = await read_body(request, inline_limit=0)
+    except BodyTooLarge as e:
+        return _too_large(e.size)
+    if spool_path is None:
+        return {"ok": False, "error": "Empty body"}
+
+    log_event(logger, "webhook.history_spooled", bytes=os.path.getsize(spool_path))
+    background_tasks.add_task(_import_and_remove, spool_path)
+    return {"ok": True, "action": "history_import"}
+
+
+async def read_body(request: Request, inline_limit: int) -> tuple[bytes | None, str | None]:
+    """
+    Read a request body: in memory up to inline_limit bytes, otherwise spooled to
+    a temp file with writes in a worker thread. Returns (body, None) or (None, path);
+    (None, None) for an empty body that would have been spooled.
+    Raises BodyTooLarge past HISTORY_MAX_BODY_BYTES, by Content-Length or as streamed.
+    """
+    limit = settings.history_max_body_bytes
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise BodyTooLarge(int(declared))
+
+    buffered: list[bytes] = []
+    size = 0
+    spool = None
+    try:
+        async for chunk in request.stream():
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > limit:
+                raise BodyTooLarge(size)
+            if spool is None and size <= inline_limit:
+                buffered.append(chunk)
+                continue
+            if spool is None:
+                spool = await asyncio.to_thread(
+                    tempfile.NamedTemporaryFile, prefix="evolution-history-", suffix=".json", delete=False
+                )
+                chunk = b"".join([*buffered, chunk])
+                buffered.clear()
+            await asyncio.to_thread(spool.write, chunk)
+    except BaseException:
+        if spool is not None:
+            await asyncio.to_thread(_close_and_remove, spool)
+        raise
+
+    if spool is None:
+        return (b"".join(buffered), None) if inline_limit > 0 else (None, None)
+    await asyncio.to_thread(spool.close)
+    return None, spool.name
+
+
+def _spooled_event(path: str) -> str | None:
+    with open(path, "rb") as stream:
+        return read_event(stream)
+
+
+def _load_and_remove(path: str):
+    try:
+        with open(path, "rb") as stream:
+            return json.load(stream)
+    finally:
+        os.unlink(path)
+
+
+def _close_and_remove(spool) -> None:
+    spool.close()
+    os.unlink(spool.name)
+
+
+def _too_large(size: int) -> JSONResponse:
+    log_event(logger, "webhook.body_too_large", level=logging.WARNING, bytes=size)
+    return JSONResponse(status_code=413, content={"ok": False, "error": "payload too large"})
@@ -1,6 +1,12 @@
 """Health check routes."""
 
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from whatsapp_agent.graphs.whatsapp_bot.graph import routing_snapshot
+from whatsapp_agent.integrations import outbound_scheduler
+from whatsapp_agent.workers.load import load_monitor
+from whatsapp_agent.workers.speculative import speculation_stats
 
 router = APIRouter(tags=["health"])
 
@@ -11,6 +17,32 @@ async def health_check():
     return {"status": "ok"}
 
 
+@router.get("/ready")
+async def readiness_check():
+    """
+    Readiness endpoint for the autoscaler / load balancer.
+    Returns 503 while the process is saturated (in-flight tasks, DB pool wait
+    or event-loop lag over their limits).
+    """
+    snapshot = load_monitor.snapshot()
+    status_code = 200 if snapshot["ready"] else 503
+    return JSONResponse(
+        status_code=status_code,
+        content={"status": "ready" if snapshot["ready"] else "saturated", **snapshot},
+    )
+
+
+@router.get("/metrics")
+async def metrics():
+    """Process counters: load, per-tier LLM routing/latency/cost, speculation, outbound sends."""
+    return {
+        "load": load_monitor.snapshot(),
+        "llm": routing_snapshot(),
+        "speculation": speculation_stats.snapshot(),
+        "outbound": outbound_scheduler.snapshot(),
+    }
+
+
 @router.get("/")
 async def root():
     """Root endpoint."""
@@ -0,0 +1,59 @@
+"""Read-only per-chat stats routes, served from the chat_stats rollup."""
+
+import hmac
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Security
+from fastapi.responses import JSONResponse
+from fastapi.security import APIKeyHeader
+
+from whatsapp_agent.db import CHAT_STATS_ORDER, get_chat_stats, list_chat_stats, get_chat_stats_totals
+from whatsapp_agent.settings import settings
+from whatsapp_agent.workers.chat_stats import summarize
+
+_api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+
+async def require_stats_api_key(api_key: str | None = Security(_api_key_header)) -> None:
+    """
+    Stats expose every chat ID (the customer's phone number) with its activity.
+    Routes are hidden (404) unless STATS_API_KEY is set, and need it in X-API-Key.
+    """
+    if not settings.stats_api_key:
+        raise HTTPException(status_code=404)
+    if api_key is None or not hmac.compare_digest(api_key.encode(), settings.stats_api_key.encode()):
+        raise HTTPException(status_code=401, detail="invalid API key")
+
+
+router = APIRouter(prefix="/stats", tags=["stats"], dependencies=[Depends(require_stats_api_key)])
+
+
+@router.get("")
+async def stats_totals():
+    """Totals across all chats: message counts, operator vs bot share, reply latency."""
+    totals, histogram = await get_chat_stats_totals()
+    return summarize({**totals, "latency_histogram": histogram})
+
+
+@router.get("/chats")
+async def stats_chats(
+    order_by: str = "last_activity",
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    """Per-chat stats, e.g. busiest chats with order_by=messages (last_activity, messages, replies, latency)."""
+    if order_by not in CHAT_STATS_ORDER:
+        return JSONResponse(
+            status_code=400,
+            content={"ok": False, "error": f"order_by must be one of {', '.join(CHAT_STATS_ORDER)}"},
+        )
+    rows = await list_chat_stats(order_by=order_by, limit=limit, offset=offset)
+    return {"chats": [summarize(row) for row in rows]}
+
+
+@router.get("/chats/{chat_id}")
+async def stats_chat(chat_id: str):
+    """Stats for one chat."""
+    row = await get_chat_stats(chat_id)
+    if row is None:
+        return JSONResponse(status_code=404, content={"ok": False, "error": "no stats for chat"})
+    return summarize(row)
@@ -1,13 +1,34 @@
 """Database module - connection pool, repositories, and locks."""
 
-from whatsapp_agent.db.conn import init_pool, close_pool, get_pool, get_conn
+from whatsapp_agent.db.conn import init_pool, close_pool, get_pool, get_conn, get_pool_wait_ms
 from whatsapp_agent.db.repo_messages import (
     insert_inbound_message,
     get_last_message_time,
+    get_last_message,
     fetch_unprocessed_messages,
+    get_orphaned_chats,
     mark_messages_processed,
     insert_outbound_message,
+    copy_inbound_messages,
 )
+from whatsapp_agent.db.repo_replies import (
+    create_reply_plan,
+    get_pending_reply_plan,
+    mark_reply_part_attempted,
+    mark_reply_part_delivered,
+    complete_reply_plan,
+    abandon_reply_plan,
+)
+from whatsapp_agent.db.repo_cadence import get_chat_cadence, upsert_chat_cadence
+from whatsapp_agent.db.repo_stats import (
+    CHAT_STATS_ORDER,
+    add_chat_stats,
+    get_chat_stats,
+    list_chat_stats,
+    get_chat_stats_totals,
+)
+from whatsapp_agent.db.repo_outbound import init_outbound_bucket, take_outbound_token, throttle_outbound_bucket
+from whatsapp_agent.db.repo_checkpoints import get_latest_checkpoint_id
 from whatsapp_agent.db.locks import advisory_lock, try_advisory_lock, release_advisory_lock
 
 __all__ = [
@@ -15,11 +36,32 @@ __all__ = [
     "close_pool",
     "get_pool",
     "get_conn",
+    "get_pool_wait_ms",
     "insert_inbound_message",
     "get_last_message_time",
+    "get_last_message",
     "fetch_unprocessed_messages",
+    "get_orphaned_chats",
     "mark_messages_processed",
     "insert_outbound_message",
+    "copy_inbound_messages",
+    "create_reply_plan",
+    "get_pending_reply_plan",
+    "mark_reply_part_attempted",
+    "mark_reply_part_delivered",
+    "complete_reply_plan",
+    "abandon_reply_plan",
+    "init_outbound_bucket",
+    "take_outbound_token",
+    "throttle_outbound_bucket",
+    "get_latest_checkpoint_id",
+    "get_chat_cadence",
+    "upsert_chat_cadence",
+    "CHAT_STATS_ORDER",
+    "add_chat_stats",
+    "get_chat_stats",
+    "list_chat_stats",
+    "get_chat_stats_totals",
     "advisory_lock",
     "try_advisory_lock",
     "release_advisory_lock",
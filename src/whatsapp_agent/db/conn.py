@@ -3,6 +3,8 @@
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
+import time
+
 import psycopg
 from psycopg_pool import AsyncConnectionPool
 
@@ -10,6 +12,12 @@ from whatsapp_agent.settings import settings
 
 _pool: AsyncConnectionPool | None = None
 
+# Smoothed time spent waiting for a pooled connection (admission control signal)
+_POOL_WAIT_ALPHA = 0.2
+_POOL_WAIT_STALE_SECONDS = 5.0
+_pool_wait_ms = 0.0
+_pool_wait_at = 0.0
+
 
 async def init_pool() -> AsyncConnectionPool:
     """Initialize the connection pool. Call once at app startup."""
@@ -40,9 +48,27 @@ def get_pool() -> AsyncConnectionPool:
     return _pool
 
 
+def get_pool_wait_ms() -> float:
+    """
+    Smoothed recent wait for a pooled connection, in milliseconds.
+    Returns 0 if no connection was requested in the last few seconds.
+    """
+    if time.monotonic() - _pool_wait_at > _POOL_WAIT_STALE_SECONDS:
+        return 0.0
+    return _pool_wait_ms
+
+
+def _record_pool_wait(wait_ms: float) -> None:
+    global _pool_wait_ms, _pool_wait_at
+    _pool_wait_ms += _POOL_WAIT_ALPHA * (wait_ms - _pool_wait_ms)
+    _pool_wait_at = time.monotonic()
+
+
 @asynccontextmanager
 async def get_conn() -> AsyncGenerator[psycopg.AsyncConnection, None]:
     """Get a connection from the pool."""
     pool = get_pool()
+    requested_at = time.monotonic()
     async with pool.connection() as conn:
+        _record_pool_wait((time.monotonic() - requested_at) * 1000)
         yield conn
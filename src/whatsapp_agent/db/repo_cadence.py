@@ -0,0 +1,46 @@
+"""Cadence repository - per-chat inter-message gap histograms for adaptive debounce."""
+
+from datetime import datetime
+
+from whatsapp_agent.db.conn import get_conn
+
+
+async def get_chat_cadence(chat_id: str) -> tuple[list[int], datetime | None, datetime | None] | None:
+    """
+    Get the gap histogram for a chat.
+    Returns (gap_histogram, last_user_message_at, answered_at), or None if nothing recorded yet.
+    """
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT gap_histogram, last_user_message_at, answered_at FROM chat_cadence
+                WHERE chat_id = %s
+                """,
+                (chat_id,),
+            )
+            return await cur.fetchone()
+
+
+async def upsert_chat_cadence(
+    chat_id: str,
+    gap_histogram: list[int],
+    last_user_message_at: datetime | None,
+    answered_at: datetime | None,
+) -> None:
+    """Store the gap histogram for a chat (caller holds the chat's advisory lock)."""
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                INSERT INTO chat_cadence (chat_id, gap_histogram, last_user_message_at, answered_at)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (chat_id) DO UPDATE
+                SET gap_histogram = EXCLUDED.gap_histogram,
+                    last_user_message_at = EXCLUDED.last_user_message_at,
+                    answered_at = EXCLUDED.answered_at,
+                    updated_at = NOW()
+                """,
+                (chat_id, gap_histogram, last_user_message_at, answered_at),
+            )
+            await conn.commit()
@@ -0,0 +1,26 @@
+"""Checkpoint repository - lightweight queries against the LangGraph checkpoint tables."""
+
+from whatsapp_agent.db.conn import get_conn
+
+
+async def get_latest_checkpoint_id(thread_id: str, checkpoint_ns: str = "") -> str | None:
+    """
+    Get the ID of the most recent checkpoint for a thread.
+
+    Only touches the checkpoints primary key index, so it is much cheaper than
+    loading and deserializing the checkpoint itself. Used to validate cached
+    thread state against writes made by other processes.
+    """
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT checkpoint_id FROM checkpoints
+                WHERE thread_id = %s AND checkpoint_ns = %s
+                ORDER BY checkpoint_id DESC
+                LIMIT 1
+                """,
+                (thread_id, checkpoint_ns),
+            )
+            row = await cur.fetchone()
+            return row[0] if row else None
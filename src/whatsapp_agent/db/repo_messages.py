@@ -56,6 +56,25 @@ async def get_last_message_time(chat_id: str) -> datetime | None:
             return row[0] if row else None
 
 
+async def get_last_message(chat_id: str) -> tuple[datetime, str, bool] | None:
+    """
+    Get the most recent inbound message for a chat.
+    Returns (received_at, text, is_from_me), or None if the chat has no messages.
+    """
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT received_at, text, is_from_me FROM inbound_messages
+                WHERE chat_id = %s
+                ORDER BY received_at DESC
+                LIMIT 1
+                """,
+                (chat_id,),
+            )
+            return await cur.fetchone()
+
+
 async def fetch_unprocessed_messages(chat_id: str) -> list[tuple[int, str, datetime, bool]]:
     """
     Fetch all unprocessed messages for a chat, ordered by received_at.
@@ -74,6 +93,42 @@ async def fetch_unprocessed_messages(chat_id: str) -> list[tuple[int, str, datet
             return await cur.fetchall()
 
 
+async def get_orphaned_chats(older_than_seconds: float, limit: int) -> list[str]:
+    """
+    Chats with unprocessed messages that no worker is handling, oldest first.
+
+    A chat qualifies when its newest unprocessed message is older than
+    older_than_seconds and nobody holds its advisory lock (the key is computed
+    as in locks._chat_id_to_lock_key). These are chats deferred by a process
+    that has since restarted or scaled down, or whose worker died mid-batch.
+    """
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT pending.chat_id
+                FROM (
+                    SELECT chat_id, MIN(received_at) AS oldest,
+                           ('x' || substr(md5(chat_id), 1, 16))::bit(64)::bigint AS lock_key
+                    FROM inbound_messages
+                    WHERE processed_at IS NULL
+                    GROUP BY chat_id
+                    HAVING MAX(received_at) < NOW() - make_interval(secs => %s)
+                ) pending
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM pg_locks l
+                    WHERE l.locktype = 'advisory' AND l.objsubid = 1 AND l.granted
+                      AND l.classid::bigint = (pending.lock_key >> 32) & 4294967295
+                      AND l.objid::bigint = pending.lock_key & 4294967295
+                )
+                ORDER BY pending.oldest
+                LIMIT %s
+                """,
+                (older_than_seconds, limit),
+            )
+            return [row[0] for row in await cur.fetchall()]
+
+
 async def mark_messages_processed(message_ids: list[int]) -> None:
     """Mark messages as processed by setting processed_at timestamp."""
     if not message_ids:
@@ -106,3 +161,45 @@ async def insert_outbound_message(chat_id: str, text: str) -> int:
             result = await cur.fetchone()
             await conn.commit()
             return result[0]
+
+
+async def copy_inbound_messages(rows: list[tuple[str, str, str, bool, datetime]]) -> int:
+    """
+    Bulk-load historical messages, already marked processed.
+    Rows are (chat_id, message_id, text, is_from_me, received_at).
+
+    Uses COPY into a temp table, then a single INSERT ... ON CONFLICT DO NOTHING
+    so re-imports and overlaps with live webhooks are deduped by message_id.
+    Returns the number of rows actually inserted.
+    """
+    if not rows:
+        return 0
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                CREATE TEMP TABLE inbound_import (
+                    chat_id TEXT,
+                    message_id TEXT,
+                    text TEXT,
+                    is_from_me BOOLEAN,
+                    received_at TIMESTAMPTZ
+                ) ON COMMIT DROP
+                """
+            )
+            async with cur.copy(
+                "COPY inbound_import (chat_id, message_id, text, is_from_me, received_at) FROM STDIN"
+            ) as copy:
+                for row in rows:
+                    await copy.write_row(row)
+            await cur.execute(
+                """
+                INSERT INTO inbound_messages (chat_id, message_id, text, is_from_me, received_at, processed_at)
+                SELECT chat_id, message_id, text, is_from_me, received_at, NOW()
+                FROM inbound_import
+                ON CONFLICT (message_id) DO NOTHING
+                """
+            )
+            inserted = cur.rowcount
+            await conn.commit()
+            return inserted
@@ -0,0 +1,129 @@
+"""Outbound bucket repository - one token bucket per Evolution instance, shared by every process."""
+
+from datetime import datetime
+
+from whatsapp_agent.db.conn import get_conn
+
+
+async def init_outbound_bucket(instance: str, burst: int, rate: float) -> None:
+    """Create the instance's bucket (full, at rate) unless another process already did."""
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                INSERT INTO outbound_buckets (instance, tokens, rate)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (instance) DO NOTHING
+                """,
+                (instance, float(burst), rate),
+            )
+            await conn.commit()
+
+
+async def take_outbound_token(
+    instance: str,
+    burst: int,
+    min_rate: float,
+    max_rate: float,
+    rate_increase: float = 0.0,
+) -> tuple[float, float, float] | None:
+    """
+    Refill the bucket for the time since its last refill and take one token if one
+    is there and sending isn't paused, all under the row lock.
+    rate_increase (earned by successful calls since the last take) is then added to
+    the rate, within [min_rate, max_rate].
+    Returns (wait_seconds, tokens, rate): wait_seconds is 0 if a token was taken, else
+    how long until one can be. None if the bucket doesn't exist.
+    """
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                WITH bucket AS (
+                    SELECT b.instance, b.rate, b.paused_until, n.now,
+                           LEAST(
+                               b.tokens + GREATEST(
+                                   EXTRACT(EPOCH FROM n.now - GREATEST(b.refilled_at, b.paused_until))::FLOAT8, 0
+                               ) * b.rate,
+                               %(burst)s
+                           ) AS tokens
+                    FROM outbound_buckets b, (SELECT clock_timestamp() AS now) n
+                    WHERE b.instance = %(instance)s
+                    FOR UPDATE OF b
+                ),
+                take AS (
+                    SELECT bucket.*, (bucket.tokens >= 1 AND bucket.paused_until <= bucket.now) AS taken
+                    FROM bucket
+                )
+                UPDATE outbound_buckets o
+                SET tokens = take.tokens - CASE WHEN take.taken THEN 1 ELSE 0 END,
+                    refilled_at = take.now,
+                    rate = LEAST(GREATEST(take.rate + %(rate_increase)s, %(min_rate)s), %(max_rate)s)
+                FROM take
+                WHERE o.instance = take.instance
+                RETURNING
+                    CASE WHEN take.taken THEN 0 ELSE GREATEST(
+                        EXTRACT(EPOCH FROM take.paused_until - take.now)::FLOAT8,
+                        (1 - take.tokens) / take.rate
+                    ) END,
+                    o.tokens,
+                    o.rate
+                """,
+                {
+                    "instance": instance,
+                    "burst": float(burst),
+                    "min_rate": min_rate,
+                    "max_rate": max_rate,
+                    "rate_increase": rate_increase,
+                },
+            )
+            row = await cur.fetchone()
+            await conn.commit()
+            return row
+
+
+async def throttle_outbound_bucket(
+    instance: str,
+    retry_after_seconds: float,
+    dispatched_at: datetime,
+    rate_decrease: float,
+    min_rate: float,
+) -> tuple[float, bool] | None:
+    """
+    Record a 429 for every process: empty the bucket, pause refills for Retry-After and
+    multiply the rate by rate_decrease, unless the throttled call was dispatched before
+    the last cut (it was sent at the old rate; one cut per throttling episode).
+    Returns (rate, cut), or None if the bucket doesn't exist.
+    """
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                WITH n AS (SELECT clock_timestamp() AS now),
+                bucket AS (
+                    SELECT b.instance, (%(dispatched_at)s >= b.decreased_at) AS cut
+                    FROM outbound_buckets b
+                    WHERE b.instance = %(instance)s
+                    FOR UPDATE OF b
+                )
+                UPDATE outbound_buckets o
+                SET tokens = 0,
+                    refilled_at = n.now,
+                    paused_until = GREATEST(o.paused_until, n.now + make_interval(secs => %(retry_after)s)),
+                    rate = CASE WHEN bucket.cut THEN GREATEST(o.rate * %(rate_decrease)s, %(min_rate)s) ELSE o.rate END,
+                    decreased_at = CASE WHEN bucket.cut THEN n.now ELSE o.decreased_at END
+                FROM bucket, n
+                WHERE o.instance = bucket.instance
+                RETURNING o.rate, bucket.cut
+                """,
+                {
+                    "instance": instance,
+                    "retry_after": retry_after_seconds,
+                    "dispatched_at": dispatched_at,
+                    "rate_decrease": rate_decrease,
+                    "min_rate": min_rate,
+                },
+            )
+            row = await cur.fetchone()
+            await conn.commit()
+            return row
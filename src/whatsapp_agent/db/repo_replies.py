@@ -0,0 +1,169 @@
+"""Reply plan repository - generated replies and per-part delivery state."""
+
+from datetime import datetime
+
+from whatsapp_agent.db.conn import get_conn
+
+
+async def create_reply_plan(
+    chat_id: str,
+    inbound_ids: list[int],
+    full_text: str,
+    parts: list[str],
+) -> int:
+    """Store a generated reply and its split parts before anything is sent. Returns the plan ID."""
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                INSERT INTO reply_plans (chat_id, inbound_ids, full_text)
+                VALUES (%s, %s, %s)
+                RETURNING id
+                """,
+                (chat_id, inbound_ids, full_text),
+            )
+            plan_id = (await cur.fetchone())[0]
+            if parts:
+                await cur.executemany(
+                    """
+                    INSERT INTO reply_plan_parts (plan_id, idx, text)
+                    VALUES (%s, %s, %s)
+                    """,
+                    [(plan_id, idx, text) for idx, text in enumerate(parts)],
+                )
+            await conn.commit()
+            return plan_id
+
+
+async def get_pending_reply_plan(
+    chat_id: str,
+) -> tuple[int, list[int], datetime, int, list[tuple[int, str, bool, bool]]] | None:
+    """
+    Get the oldest reply plan for a chat that was not fully delivered.
+    Returns (plan_id, inbound_ids, created_at, attempts, parts), where attempts
+    is the most send attempts made for any undelivered part and parts are
+    (idx, text, delivered, attempted) tuples.
+    """
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT id, inbound_ids, created_at FROM reply_plans
+                WHERE chat_id = %s AND completed_at IS NULL
+                ORDER BY created_at ASC
+                LIMIT 1
+                """,
+                (chat_id,),
+            )
+            plan = await cur.fetchone()
+            if plan is None:
+                return None
+            await cur.execute(
+                """
+                SELECT idx, text, delivered_at IS NOT NULL, attempted_at IS NOT NULL, attempts
+                FROM reply_plan_parts
+                WHERE plan_id = %s
+                ORDER BY idx ASC
+                """,
+                (plan[0],),
+            )
+            rows = await cur.fetchall()
+            attempts = max((row[4] for row in rows if not row[2]), default=0)
+            return plan[0], plan[1], plan[2], attempts, [row[:4] for row in rows]
+
+
+async def mark_reply_part_attempted(plan_id: int, idx: int) -> None:
+    """
+    Record that a send is about to be attempted. A part attempted but never
+    marked delivered may have gone out; it is checked with Evolution before a resend.
+    """
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                UPDATE reply_plan_parts
+                SET attempted_at = NOW(), attempts = attempts + 1
+                WHERE plan_id = %s AND idx = %s
+                """,
+                (plan_id, idx),
+            )
+            await conn.commit()
+
+
+async def mark_reply_part_delivered(
+    plan_id: int,
+    idx: int,
+    chat_id: str,
+    text: str,
+    evolution_message_id: str | None,
+) -> None:
+    """Mark a part delivered and log it as an outbound message, atomically."""
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                UPDATE reply_plan_parts
+                SET delivered_at = NOW(), evolution_message_id = %s
+                WHERE plan_id = %s AND idx = %s
+                """,
+                (evolution_message_id, plan_id, idx),
+            )
+            await cur.execute(
+                """
+                INSERT INTO outbound_messages (chat_id, text)
+                VALUES (%s, %s)
+                """,
+                (chat_id, text),
+            )
+            await conn.commit()
+
+
+async def complete_reply_plan(plan_id: int, inbound_ids: list[int]) -> list[tuple]:
+    """
+    Mark a plan completed and its inbound messages processed, atomically.
+    Returns the answered messages as (received_at, is_from_me) tuples.
+    """
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "UPDATE reply_plans SET completed_at = NOW() WHERE id = %s",
+                (plan_id,),
+            )
+            await cur.execute(
+                """
+                UPDATE inbound_messages
+                SET processed_at = NOW()
+                WHERE id = ANY(%s)
+                RETURNING received_at, is_from_me
+                """,
+                (inbound_ids,),
+            )
+            answered = await cur.fetchall()
+            await conn.commit()
+            return answered
+
+
+async def abandon_reply_plan(plan_id: int, inbound_ids: list[int]) -> list[tuple]:
+    """
+    Give up on a plan that can't be delivered: mark it completed and failed,
+    and its inbound messages processed, atomically.
+    Returns the messages as (received_at, is_from_me) tuples.
+    """
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "UPDATE reply_plans SET completed_at = NOW(), failed_at = NOW() WHERE id = %s",
+                (plan_id,),
+            )
+            await cur.execute(
+                """
+                UPDATE inbound_messages
+                SET processed_at = NOW()
+                WHERE id = ANY(%s) AND processed_at IS NULL
+                RETURNING received_at, is_from_me
+                """,
+                (inbound_ids,),
+            )
+            abandoned = await cur.fetchall()
+            await conn.commit()
+            return abandoned
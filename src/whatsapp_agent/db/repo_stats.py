@@ -0,0 +1,145 @@
+"""Chat stats repository - incrementally maintained per-chat rollup for ops queries."""
+
+from datetime import datetime
+
+from psycopg.rows import dict_row
+
+from whatsapp_agent.db.conn import get_conn
+
+# Orderings accepted by list_chat_stats, mapped to SQL
+CHAT_STATS_ORDER = {
+    "last_activity": "GREATEST(last_inbound_at, last_reply_at) DESC NULLS LAST",
+    "messages": "user_messages + operator_messages DESC",
+    "replies": "replies DESC",
+    "latency": "latency_sum_seconds / NULLIF(latency_count, 0) DESC NULLS LAST",
+}
+
+
+async def add_chat_stats(
+    chat_id: str,
+    user_messages: int = 0,
+    operator_messages: int = 0,
+    replies: int = 0,
+    reply_parts: int = 0,
+    last_inbound_at: datetime | None = None,
+    last_reply_at: datetime | None = None,
+    latency_seconds: float | None = None,
+    latency_histogram: list[int] | None = None,
+) -> None:
+    """
+    Add deltas to a chat's rollup row in one upsert (no read-modify-write).
+    latency_histogram holds the bucket counts to add; a layout change resets it.
+    """
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                INSERT INTO chat_stats (
+                    chat_id, user_messages, operator_messages, replies, reply_parts,
+                    last_inbound_at, last_reply_at, latency_count, latency_sum_seconds,
+                    latency_min_seconds, latency_max_seconds, latency_histogram
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::INTEGER[])
+                ON CONFLICT (chat_id) DO UPDATE
+                SET user_messages = chat_stats.user_messages + EXCLUDED.user_messages,
+                    operator_messages = chat_stats.operator_messages + EXCLUDED.operator_messages,
+                    replies = chat_stats.replies + EXCLUDED.replies,
+                    reply_parts = chat_stats.reply_parts + EXCLUDED.reply_parts,
+                    last_inbound_at = GREATEST(chat_stats.last_inbound_at, EXCLUDED.last_inbound_at),
+                    last_reply_at = GREATEST(chat_stats.last_reply_at, EXCLUDED.last_reply_at),
+                    latency_count = chat_stats.latency_count + EXCLUDED.latency_count,
+                    latency_sum_seconds = chat_stats.latency_sum_seconds + EXCLUDED.latency_sum_seconds,
+                    latency_min_seconds = LEAST(chat_stats.latency_min_seconds, EXCLUDED.latency_min_seconds),
+                    latency_max_seconds = GREATEST(chat_stats.latency_max_seconds, EXCLUDED.latency_max_seconds),
+                    latency_histogram = CASE
+                        WHEN cardinality(EXCLUDED.latency_histogram) = 0 THEN chat_stats.latency_histogram
+                        WHEN cardinality(chat_stats.latency_histogram) <> cardinality(EXCLUDED.latency_histogram)
+                            THEN EXCLUDED.latency_histogram
+                        ELSE ARRAY(
+                            SELECT a + b
+                            FROM unnest(chat_stats.latency_histogram, EXCLUDED.latency_histogram)
+                                WITH ORDINALITY AS h(a, b, i)
+                            ORDER BY i
+                        )
+                    END,
+                    updated_at = NOW()
+                """,
+                (
+                    chat_id,
+                    user_messages,
+                    operator_messages,
+                    replies,
+                    reply_parts,
+                    last_inbound_at,
+                    last_reply_at,
+                    1 if latency_seconds is not None else 0,
+                    latency_seconds or 0.0,
+                    latency_seconds,
+                    latency_seconds,
+                    latency_histogram or [],
+                ),
+            )
+            await conn.commit()
+
+
+async def get_chat_stats(chat_id: str) -> dict | None:
+    """Get one chat's rollup row, or None if the chat has no stats yet."""
+    async with get_conn() as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute("SELECT * FROM chat_stats WHERE chat_id = %s", (chat_id,))
+            return await cur.fetchone()
+
+
+async def list_chat_stats(order_by: str = "last_activity", limit: int = 50, offset: int = 0) -> list[dict]:
+    """List rollup rows, ordered by one of CHAT_STATS_ORDER."""
+    async with get_conn() as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(
+                f"""
+                SELECT * FROM chat_stats
+                ORDER BY {CHAT_STATS_ORDER[order_by]}, chat_id
+                LIMIT %s OFFSET %s
+                """,
+                (limit, offset),
+            )
+            return await cur.fetchall()
+
+
+async def get_chat_stats_totals() -> tuple[dict, list[int]]:
+    """
+    Totals across all chats from the rollup.
+    Returns (totals, latency histogram summed element-wise across chats).
+    """
+    async with get_conn() as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(
+                """
+                SELECT
+                    COUNT(*) AS chats,
+                    COALESCE(SUM(user_messages), 0) AS user_messages,
+                    COALESCE(SUM(operator_messages), 0) AS operator_messages,
+                    COALESCE(SUM(replies), 0) AS replies,
+                    COALESCE(SUM(reply_parts), 0) AS reply_parts,
+                    MAX(GREATEST(last_inbound_at, last_reply_at)) AS last_activity_at,
+                    COALESCE(SUM(latency_count), 0) AS latency_count,
+                    COALESCE(SUM(latency_sum_seconds), 0) AS latency_sum_seconds,
+                    MIN(latency_min_seconds) AS latency_min_seconds,
+                    MAX(latency_max_seconds) AS latency_max_seconds
+                FROM chat_stats
+                """
+            )
+            totals = await cur.fetchone()
+            await cur.execute(
+                """
+                SELECT h.i AS idx, SUM(h.n) AS count
+                FROM chat_stats, unnest(latency_histogram) WITH ORDINALITY AS h(n, i)
+                GROUP BY h.i
+                ORDER BY h.i
+                """
+            )
+            histogram: list[int] = []
+            for row in await cur.fetchall():
+                idx = row["idx"] - 1
+                histogram.extend([0] * (idx + 1 - len(histogram)))
+                histogram[idx] = int(row["count"])
+            return totals, histogram
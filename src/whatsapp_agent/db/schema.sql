@@ -31,3 +31,77 @@ CREATE TABLE IF NOT EXISTS outbound_messages (
 
 CREATE INDEX IF NOT EXISTS idx_outbound_chat 
 ON outbound_messages (chat_id, sent_at DESC);
+
+-- Per-chat typing cadence for adaptive debounce
+-- gap_histogram: log-bucketed counts of gaps (seconds) between consecutive user messages
+-- in one burst (a batch, or a batch and the one that continued it before it was answered)
+CREATE TABLE IF NOT EXISTS chat_cadence (
+    chat_id TEXT PRIMARY KEY,
+    gap_histogram INTEGER[] NOT NULL,
+    last_user_message_at TIMESTAMPTZ,  -- last user message of the last recorded batch
+    answered_at TIMESTAMPTZ,           -- when that batch was answered; NULL = not (yet)
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Generated replies, stored before sending so retries resume instead of regenerating
+CREATE TABLE IF NOT EXISTS reply_plans (
+    id BIGSERIAL PRIMARY KEY,
+    chat_id TEXT NOT NULL,
+    inbound_ids BIGINT[] NOT NULL,  -- inbound_messages answered by this reply
+    full_text TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    completed_at TIMESTAMPTZ,  -- NULL = not fully delivered yet
+    failed_at TIMESTAMPTZ      -- set with completed_at when abandoned undelivered
+);
+
+CREATE INDEX IF NOT EXISTS idx_reply_plans_pending
+ON reply_plans (chat_id, created_at)
+WHERE completed_at IS NULL;
+
+-- One row per "|||" bubble with its delivery state
+CREATE TABLE IF NOT EXISTS reply_plan_parts (
+    plan_id BIGINT NOT NULL REFERENCES reply_plans (id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    attempted_at TIMESTAMPTZ,   -- set = may have gone out; checked with Evolution before a resend
+    evolution_message_id TEXT,  -- key.id returned by Evolution sendText
+    delivered_at TIMESTAMPTZ,   -- NULL = not delivered yet
+    PRIMARY KEY (plan_id, idx)
+);
+
+-- Upgrade reply plan tables created by earlier versions of this file
+ALTER TABLE reply_plans ADD COLUMN IF NOT EXISTS failed_at TIMESTAMPTZ;
+ALTER TABLE reply_plan_parts DROP COLUMN IF EXISTS idempotency_key;
+
+-- Outbound token bucket per Evolution instance, shared by every process that sends
+-- (the scheduler takes tokens and records 429s here; 'epoch' = never)
+CREATE TABLE IF NOT EXISTS outbound_buckets (
+    instance TEXT PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    rate DOUBLE PRECISION NOT NULL,                      -- tokens per second, AIMD-adjusted
+    refilled_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    paused_until TIMESTAMPTZ NOT NULL DEFAULT 'epoch',   -- no refills before this (Retry-After)
+    decreased_at TIMESTAMPTZ NOT NULL DEFAULT 'epoch'    -- last rate cut
+);
+
+-- Per-chat rollup for ops queries, updated by the worker as batches are processed
+-- (dashboards read this instead of scanning inbound/outbound messages).
+-- Counts start when the table is created; imported history is not counted.
+-- latency_*: seconds from the last user message of a batch to its reply being fully sent;
+-- latency_histogram: log-bucketed counts, merged element-wise
+CREATE TABLE IF NOT EXISTS chat_stats (
+    chat_id TEXT PRIMARY KEY,
+    user_messages BIGINT NOT NULL DEFAULT 0,
+    operator_messages BIGINT NOT NULL DEFAULT 0,
+    replies BIGINT NOT NULL DEFAULT 0,
+    reply_parts BIGINT NOT NULL DEFAULT 0,
+    last_inbound_at TIMESTAMPTZ,
+    last_reply_at TIMESTAMPTZ,
+    latency_count BIGINT NOT NULL DEFAULT 0,
+    latency_sum_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    latency_min_seconds DOUBLE PRECISION,
+    latency_max_seconds DOUBLE PRECISION,
+    latency_histogram INTEGER[] NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
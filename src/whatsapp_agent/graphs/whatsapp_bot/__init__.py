@@ -1,6 +1,11 @@
 """WhatsApp bot graph module."""
 
 from whatsapp_agent.graphs.whatsapp_bot.state import ChatState
-from whatsapp_agent.graphs.whatsapp_bot.graph import build_graph, build_app, create_checkpointer
+from whatsapp_agent.graphs.whatsapp_bot.graph import (
+    batch_to_messages,
+    build_graph,
+    build_app,
+    create_checkpointer,
+)
 
-__all__ = ["ChatState", "build_graph", "build_app", "create_checkpointer"]
+__all__ = ["ChatState", "batch_to_messages", "build_graph", "build_app", "create_checkpointer"]
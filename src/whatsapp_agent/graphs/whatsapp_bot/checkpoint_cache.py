@@ -0,0 +1,324 @@
+"""Write-through in-memory cache of recent thread state in front of a checkpointer."""
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Collection, Iterator, Mapping, Sequence
+
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+
+from whatsapp_agent.db import get_latest_checkpoint_id
+
+logger = logging.getLogger(__name__)
+
+# Rough per-object overhead used when estimating the in-memory size of a checkpoint
+_OBJECT_OVERHEAD = 64
+
+
+def _estimate_size(value: Any) -> int:
+    """Cheaply estimate the in-memory footprint of a checkpoint value in bytes."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return 16
+    if isinstance(value, (str, bytes)):
+        return _OBJECT_OVERHEAD + len(value)
+    if isinstance(value, BaseMessage):
+        return (
+            _OBJECT_OVERHEAD * 4
+            + _estimate_size(value.content)
+            + _estimate_size(value.additional_kwargs)
+            + len(value.id or "")
+        )
+    if isinstance(value, dict):
+        return _OBJECT_OVERHEAD + sum(
+            _estimate_size(k) + _estimate_size(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set)):
+        return _OBJECT_OVERHEAD + sum(_estimate_size(v) for v in value)
+    return _OBJECT_OVERHEAD * 2
+
+
+class _CacheEntry:
+    """A cached checkpoint tuple plus bookkeeping for eviction."""
+
+    __slots__ = ("tuple", "size", "last_access")
+
+    def __init__(self, checkpoint_tuple: CheckpointTuple, size: int):
+        self.tuple = checkpoint_tuple
+        self.size = size
+        self.last_access = time.monotonic()
+
+
+class CachedCheckpointSaver(BaseCheckpointSaver):
+    """
+    Checkpointer wrapper that keeps the latest checkpoint of recent threads in memory.
+
+    - Writes go through to the wrapped saver first, then update the cache.
+    - Reads of the latest checkpoint are served from memory after a cheap
+      version check (latest checkpoint_id in Postgres), so a thread written by
+      another process is reloaded instead of served stale.
+    - Bounded by estimated bytes (LRU) and evicts entries idle for too long.
+
+    Reads of a specific checkpoint_id, listing and history reads always
+    delegate. Every other mutating method drops the affected threads (or the
+    whole cache when they can't be known) before delegating.
+    """
+
+    def __init__(
+        self,
+        saver: BaseCheckpointSaver,
+        max_bytes: int,
+        idle_seconds: float,
+        validate: bool = True,
+    ):
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.validate = validate
+        self._entries: OrderedDict[tuple[str, str], _CacheEntry] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    # --- cache bookkeeping ---
+
+    @staticmethod
+    def _key(config: RunnableConfig) -> tuple[str, str]:
+        configurable = config["configurable"]
+        return configurable["thread_id"], configurable.get("checkpoint_ns", "")
+
+    def _drop(self, key: tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _store(self, key: tuple[str, str], checkpoint_tuple: CheckpointTuple) -> None:
+        self._drop(key)
+        size = _estimate_size(checkpoint_tuple.checkpoint["channel_values"])
+        if size > self.max_bytes:
+            return
+        self._entries[key] = _CacheEntry(checkpoint_tuple, size)
+        self._bytes += size
+        self._evict()
+
+    def _evict(self) -> None:
+        """Evict idle entries, then least recently used ones until under budget."""
+        cutoff = time.monotonic() - self.idle_seconds
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if self._bytes <= self.max_bytes and entry.last_access >= cutoff:
+                break
+            self._drop(key)
+
+    def _lookup(self, config: RunnableConfig) -> _CacheEntry | None:
+        key = self._key(config)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.last_access > self.idle_seconds:
+            self._drop(key)
+            return None
+        entry.last_access = time.monotonic()
+        self._entries.move_to_end(key)
+        return entry
+
+    def invalidate(self, thread_id: str) -> None:
+        """Drop all cached state for a thread."""
+        for key in [k for k in self._entries if k[0] == thread_id]:
+            self._drop(key)
+
+    def clear(self) -> None:
+        """Drop all cached state."""
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        """Snapshot of cache counters for logging/metrics."""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    # --- async API (used by the worker) ---
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        if config["configurable"].get("checkpoint_id"):
+            return await self.saver.aget_tuple(config)
+
+        entry = self._lookup(config)
+        if entry is not None:
+            cached_id = entry.tuple.checkpoint["id"]
+            thread_id, checkpoint_ns = self._key(config)
+            if not self.validate or cached_id == await get_latest_checkpoint_id(thread_id, checkpoint_ns):
+                self.hits += 1
+                return entry.tuple
+            logger.debug(f"Checkpoint cache stale for {thread_id}, reloading")
+            self._drop(self._key(config))
+
+        self.misses += 1
+        checkpoint_tuple = await self.saver.aget_tuple(config)
+        if checkpoint_tuple is not None:
+            self._store(self._key(config), checkpoint_tuple)
+        return checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        key = self._key(config)
+        try:
+            next_config = await self.saver.aput(config, checkpoint, metadata, new_versions)
+        except Exception:
+            self._drop(key)
+            raise
+
+        parent_config = config if config["configurable"].get("checkpoint_id") else None
+        self._store(
+            key,
+            CheckpointTuple(
+                config=next_config,
+                checkpoint=checkpoint,
+                metadata=metadata,
+                parent_config=parent_config,
+                pending_writes=[],
+            ),
+        )
+        return next_config
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        # Pending writes attach to an existing checkpoint; rather than mirror the
+        # saver's upsert rules, drop the cached copy so the next read reloads it.
+        entry = self._entries.get(self._key(config))
+        if entry is not None and entry.tuple.checkpoint["id"] == config["configurable"].get("checkpoint_id"):
+            self._drop(self._key(config))
+        await self.saver.aput_writes(config, writes, task_id, task_path)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        async for item in self.saver.alist(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aget_delta_channel_history(
+        self,
+        *,
+        config: RunnableConfig,
+        channels: Sequence[str],
+    ) -> Mapping[str, Any]:
+        return await self.saver.aget_delta_channel_history(config=config, channels=channels)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.invalidate(thread_id)
+        await self.saver.adelete_thread(thread_id)
+
+    async def adelete_for_runs(self, run_ids: Sequence[str]) -> None:
+        # Which threads the runs belong to isn't known here
+        self.clear()
+        await self.saver.adelete_for_runs(run_ids)
+
+    async def acopy_thread(self, source_thread_id: str, target_thread_id: str) -> None:
+        self.invalidate(target_thread_id)
+        await self.saver.acopy_thread(source_thread_id, target_thread_id)
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        for thread_id in thread_ids:
+            self.invalidate(thread_id)
+        await self.saver.aprune(thread_ids, strategy=strategy)
+
+    # --- sync API (delegates, keeping the cache coherent) ---
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return self.saver.get_tuple(config)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        return self.saver.list(config, filter=filter, before=before, limit=limit)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        self._drop(self._key(config))
+        return self.saver.put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self._drop(self._key(config))
+        self.saver.put_writes(config, writes, task_id, task_path)
+
+    def get_delta_channel_history(
+        self,
+        *,
+        config: RunnableConfig,
+        channels: Sequence[str],
+    ) -> Mapping[str, Any]:
+        return self.saver.get_delta_channel_history(config=config, channels=channels)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.invalidate(thread_id)
+        self.saver.delete_thread(thread_id)
+
+    def delete_for_runs(self, run_ids: Sequence[str]) -> None:
+        self.clear()
+        self.saver.delete_for_runs(run_ids)
+
+    def copy_thread(self, source_thread_id: str, target_thread_id: str) -> None:
+        self.invalidate(target_thread_id)
+        self.saver.copy_thread(source_thread_id, target_thread_id)
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        for thread_id in thread_ids:
+            self.invalidate(thread_id)
+        self.saver.prune(thread_ids, strategy=strategy)
+
+    def get_next_version(self, current: Any, channel: Any) -> Any:
+        return self.saver.get_next_version(current, channel)
+
+    def with_allowlist(self, extra_allowlist: Collection[tuple[str, ...]]) -> BaseCheckpointSaver:
+        """
+        Apply a msgpack allowlist to the wrapped saver (which does the loading).
+        A derived saver gets its own, empty cache: a shallow copy would share
+        entries but not the byte accounting.
+        """
+        saver = self.saver.with_allowlist(extra_allowlist)
+        if saver is self.saver:
+            return self
+        return CachedCheckpointSaver(saver, self.max_bytes, self.idle_seconds, validate=self.validate)
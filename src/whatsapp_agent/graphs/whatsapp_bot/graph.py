@@ -1,68 +1,316 @@
 """LangGraph agent for WhatsApp bot."""
 
+import asyncio
+import logging
+import time
+from datetime import datetime
+
 from langgraph.graph import StateGraph, END
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import trim_messages
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, trim_messages
 import psycopg
 
 from whatsapp_agent.settings import settings
 from whatsapp_agent.graphs.whatsapp_bot.state import ChatState
 from whatsapp_agent.graphs.whatsapp_bot.prompts import SYSTEM_PROMPT
+from whatsapp_agent.graphs.whatsapp_bot.checkpoint_cache import CachedCheckpointSaver
+from whatsapp_agent.graphs.whatsapp_bot.serde import CompactSerializer
 
+logger = logging.getLogger(__name__)
 
-def get_llm() -> ChatOpenAI:
-    """Create the LLM instance configured for OpenRouter."""
-    return ChatOpenAI(
-        model=settings.openrouter_model,
-        temperature=0.7,
-        openai_api_key=settings.openrouter_api_key,
-        openai_api_base="https://openrouter.ai/api/v1",
-    )
+# Model tiers: "main" is settings.openrouter_model, "fast" is settings.openrouter_fast_model
+MAIN_TIER = "main"
+FAST_TIER = "fast"
 
+_llms: dict[str, ChatOpenAI] = {}
 
-async def agent_node(state: ChatState) -> dict:
+
+def get_llm(tier: str = MAIN_TIER) -> ChatOpenAI:
+    """Get the (cached) LLM instance for a tier, configured for OpenRouter."""
+    if tier not in _llms:
+        model = settings.openrouter_fast_model if tier == FAST_TIER else settings.openrouter_model
+        _llms[tier] = ChatOpenAI(
+            model=model,
+            temperature=0.7,
+            openai_api_key=settings.openrouter_api_key,
+            openai_api_base="https://openrouter.ai/api/v1",
+            # Ask OpenRouter to include cost in the usage block
+            extra_body={"usage": {"include": True}},
+        )
+    return _llms[tier]
+
+
+class TierStats:
+    """Running routing, latency, token and cost counters for one model tier."""
+
+    def __init__(self):
+        self.routed = 0
+        self.calls = 0
+        self.fallbacks = 0
+        self.errors = 0
+        self.latency_seconds = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        self.reasons: dict[str, int] = {}
+
+    def record_call(self, response: AIMessage, latency: float) -> None:
+        self.calls += 1
+        self.latency_seconds += latency
+        usage = response.usage_metadata or {}
+        self.input_tokens += usage.get("input_tokens", 0)
+        self.output_tokens += usage.get("output_tokens", 0)
+        token_usage = response.response_metadata.get("token_usage") or {}
+        self.cost += token_usage.get("cost") or 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "routed": self.routed,
+            "calls": self.calls,
+            "fallbacks": self.fallbacks,
+            "errors": self.errors,
+            "avg_latency_ms": round(self.latency_seconds / self.calls * 1000, 1) if self.calls else None,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost": round(self.cost, 6),
+            "reasons": dict(self.reasons),
+        }
+
+
+routing_stats: dict[str, TierStats] = {MAIN_TIER: TierStats(), FAST_TIER: TierStats()}
+
+
+def current_batch(messages: list[BaseMessage]) -> list[BaseMessage]:
+    """The user messages of the current turn (trailing HumanMessages)."""
+    batch: list[BaseMessage] = []
+    for message in reversed(messages):
+        if not isinstance(message, HumanMessage):
+            break
+        batch.append(message)
+    batch.reverse()
+    return batch
+
+
+def routing_snapshot() -> dict:
+    """Per-tier routing, latency and cost counters."""
+    return {tier: stats.snapshot() for tier, stats in routing_stats.items()}
+
+
+def choose_tier(messages: list[BaseMessage]) -> tuple[str, str]:
     """
-    Main agent node - processes messages and generates response.
-    Limits history to last 20 messages to manage context window and cost.
+    Pick a model tier for this turn from cheap signals.
+    Returns (tier, reason). Anything that looks non-trivial goes to the main model.
+    """
+    if not settings.openrouter_fast_model:
+        return MAIN_TIER, "routing_disabled"
+
+    batch_text = " ".join(m.content for m in current_batch(messages) if isinstance(m.content, str))
+    lowered = batch_text.lower()
+
+    if len(batch_text) > settings.routing_fast_max_chars:
+        return MAIN_TIER, "long_batch"
+    if batch_text.count("?") > settings.routing_fast_max_questions:
+        return MAIN_TIER, "questions"
+    if len(messages) < settings.routing_fast_min_history:
+        return MAIN_TIER, "new_conversation"
+    if any(keyword in lowered for keyword in settings.routing_main_keywords):
+        return MAIN_TIER, "keyword"
+    return FAST_TIER, "simple"
+
+
+# Per-message allowance (role, formatting) when sizing history in characters
+MESSAGE_OVERHEAD_CHARS = 16
+
+# Appended to a message cut short to fit the history budget
+TRUNCATED_MARKER = " [...]"
+
+
+def _message_chars(message: BaseMessage) -> int:
+    content = message.content
+    return (len(content) if isinstance(content, str) else len(str(content))) + MESSAGE_OVERHEAD_CHARS
+
+
+def history_chars(messages: list[BaseMessage]) -> int:
+    """Approximate prompt size of messages in characters."""
+    return sum(_message_chars(m) for m in messages)
+
+
+def trim_history(messages: list[BaseMessage]) -> list[BaseMessage]:
+    """
+    Trim conversation history to the most recent settings.history_max_chars.
+    Sized by characters rather than message count, since each message of a
+    burst is its own message: a burst of short lines costs what it says.
+    The current batch is always kept, cut short if it alone exceeds the budget.
+    The system prompt is not part of state; it is prepended when invoking the LLM.
     """
-    llm = get_llm()
+    # Only the tail that can fit matters; cut there first so trim_messages
+    # doesn't re-count the whole thread on every step
+    start, size = len(messages), 0
+    while start > 0 and size <= settings.history_max_chars:
+        start -= 1
+        size += _message_chars(messages[start])
 
-    # Trim messages to keep last 20 (plus system prompt implicitly via graph structure if managed there,
-    # but here we pass SYSTEM_PROMPT explicitly in invoke)
-    # We trim the state messages first
-    trimmed_messages = trim_messages(
-        state["messages"],
+    trimmed = trim_messages(
+        messages[start:],
         strategy="last",
-        token_counter=len, # Simple count-based trimming
-        max_tokens=20,     # Keep last 20 messages
+        token_counter=history_chars,
+        max_tokens=settings.history_max_chars,
         start_on="human",  # Ensure we don't cut in middle of AI response (though less critical with simple list)
         include_system=False, # We manually add system prompt
         allow_partial=False,
     )
+    batch = current_batch(messages)
+    if len(trimmed) < len(batch):
+        # The current batch alone is over budget; never answer without it
+        return _fit_batch(batch)
+    return trimmed
 
-    response = await llm.ainvoke([SYSTEM_PROMPT, *trimmed_messages])
+
+def _fit_batch(batch: list[BaseMessage]) -> list[BaseMessage]:
+    """
+    The newest messages of an over-budget batch that fit in history_max_chars.
+    The oldest one kept is cut short to fill the rest, so at least the start
+    of the user's last message always reaches the LLM.
+    """
+    kept: list[BaseMessage] = []
+    budget = settings.history_max_chars
+    for message in reversed(batch):
+        size = _message_chars(message)
+        if size <= budget:
+            kept.append(message)
+            budget -= size
+            continue
+        room = budget - MESSAGE_OVERHEAD_CHARS - len(TRUNCATED_MARKER)
+        if room > 0 or not kept:
+            content = message.content if isinstance(message.content, str) else str(message.content)
+            kept.append(message.model_copy(update={"content": content[: max(room, 0)] + TRUNCATED_MARKER}))
+        break
+    kept.reverse()
+    return kept
+
+
+async def _invoke_tier(tier: str, prompt: list[BaseMessage], timeout: float | None = None) -> AIMessage:
+    """Invoke a tier's LLM, recording latency/usage. Raises on error or timeout."""
+    stats = routing_stats[tier]
+    started = time.monotonic()
+    try:
+        response = await asyncio.wait_for(get_llm(tier).ainvoke(prompt), timeout)
+    except Exception:
+        stats.errors += 1
+        raise
+    stats.record_call(response, time.monotonic() - started)
+    return response
+
+
+async def generate_reply(messages: list[BaseMessage]) -> AIMessage:
+    """
+    Generate the assistant reply for a conversation.
+    Routes to the fast or main model; a fast-model timeout or error falls
+    back to the main model.
+    """
+    tier, reason = choose_tier(messages)
+    stats = routing_stats[tier]
+    stats.routed += 1
+    stats.reasons[reason] = stats.reasons.get(reason, 0) + 1
+    logger.info(f"Routing turn to {tier} model ({reason})")
+
+    prompt = [SYSTEM_PROMPT, *trim_history(messages)]
+
+    if tier == FAST_TIER:
+        try:
+            return await _invoke_tier(FAST_TIER, prompt, timeout=settings.routing_fast_timeout_seconds)
+        except Exception as e:
+            stats.fallbacks += 1
+            logger.warning(f"Fast model failed ({type(e).__name__}), falling back to main model")
+
+    return await _invoke_tier(MAIN_TIER, prompt)
+
+
+async def agent_node(state: ChatState) -> dict:
+    """
+    Main agent node - processes messages and generates response.
+    Limits history to the last HISTORY_MAX_CHARS characters to manage context window and cost.
+    """
+    response = await generate_reply(state["messages"])
     return {"messages": [response]}
 
 
+def batch_to_messages(batch: list[tuple[int, str, datetime, bool]]) -> list[BaseMessage]:
+    """
+    Convert an ordered batch of inbound rows into LangChain messages.
+
+    Rows are (id, text, received_at, is_from_me) as returned by
+    fetch_unprocessed_messages. Operator messages become AIMessage (they speak
+    as the assistant), user messages become HumanMessage. Order is preserved,
+    each message keeps its timestamp, and the message ID is derived from the
+    inbound row so re-applying the same batch replaces rather than duplicates.
+    """
+    messages: list[BaseMessage] = []
+    for row_id, text, received_at, is_from_me in batch:
+        message_cls = AIMessage if is_from_me else HumanMessage
+        messages.append(
+            message_cls(
+                content=text,
+                id=f"inbound:{row_id}",
+                additional_kwargs={"received_at": received_at.isoformat()},
+            )
+        )
+    return messages
+
+
+def route_entry(state: ChatState) -> str:
+    """
+    Decide whether this turn needs a reply.
+    If the last message is from the operator (AIMessage), they are handling
+    the chat, so the batch is only recorded and the agent is skipped.
+    """
+    messages = state["messages"]
+    if not messages or isinstance(messages[-1], AIMessage):
+        return END
+    return "agent"
+
+
 def build_graph() -> StateGraph:
-    """Build the LangGraph state graph (not compiled)."""
+    """
+    Build the LangGraph state graph (not compiled).
+
+    The input is the whole ordered batch of the turn (operator and user
+    messages). Invoked with durability="exit", the batch and the reply are
+    persisted together in a single checkpoint write.
+    """
     graph = StateGraph(ChatState)
     graph.add_node("agent", agent_node)
-    graph.set_entry_point("agent")
+    graph.set_conditional_entry_point(route_entry, {"agent": "agent", END: END})
     graph.add_edge("agent", END)
     return graph
 
 
 async def create_checkpointer():
-    """Create an async Postgres checkpointer for conversation memory."""
+    """
+    Create an async Postgres checkpointer for conversation memory.
+    Uses the compact message serializer and a write-through in-memory cache
+    unless disabled in settings.
+    """
     conn = await psycopg.AsyncConnection.connect(settings.database_url, autocommit=True)
-    checkpointer = AsyncPostgresSaver(conn)
+    serde = (
+        CompactSerializer(compress_min_bytes=settings.checkpoint_compress_min_bytes)
+        if settings.checkpoint_compact_serde
+        else None
+    )
+    checkpointer = AsyncPostgresSaver(conn, serde=serde)
     await checkpointer.setup()
-    return checkpointer
+    if not settings.checkpoint_cache_enabled:
+        return checkpointer
+    return CachedCheckpointSaver(
+        checkpointer,
+        max_bytes=settings.checkpoint_cache_max_bytes,
+        idle_seconds=settings.checkpoint_cache_idle_seconds,
+    )
 
 
-async def build_app(checkpointer: AsyncPostgresSaver):
+async def build_app(checkpointer: BaseCheckpointSaver):
     """Build and compile the graph with a checkpointer."""
     graph = build_graph()
     return graph.compile(checkpointer=checkpointer)
@@ -0,0 +1,110 @@
+"""Compact, optionally compressed checkpoint serializer for the WhatsApp bot graph."""
+
+from typing import Any
+
+import ormsgpack
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+try:
+    import zstandard
+except ImportError:  # optional dependency: pip install "whatsapp-agent[zstd]"
+    zstandard = None
+
+# Type tag for a list of plain chat messages, and suffix for compressed payloads
+MESSAGES_TYPE = "wa_msgs1"
+ZSTD_SUFFIX = "+zstd"
+
+# Message kinds, stored as the first field of each encoded message
+_KINDS: dict[type, int] = {HumanMessage: 0, AIMessage: 1, SystemMessage: 2}
+_CLASSES = {kind: cls for cls, kind in _KINDS.items()}
+
+# Fields covered by the positional encoding; anything else set falls back to the default serializer
+_ENCODED_FIELDS = {
+    "content", "additional_kwargs", "response_metadata", "type", "name", "id",
+    "tool_calls", "invalid_tool_calls", "usage_metadata",
+}
+
+
+def _encodable(message: Any) -> bool:
+    """True if a message round-trips losslessly through the positional encoding."""
+    if type(message) not in _KINDS or not isinstance(message.content, str):
+        return False
+    if not message.model_fields_set <= _ENCODED_FIELDS:
+        return False
+    if isinstance(message, AIMessage) and (message.tool_calls or message.invalid_tool_calls):
+        return False
+    return True
+
+
+def _encode_message(message: BaseMessage) -> list:
+    return [
+        _KINDS[type(message)],
+        message.content,
+        message.id,
+        message.name,
+        message.additional_kwargs or None,
+        message.response_metadata or None,
+        message.usage_metadata if isinstance(message, AIMessage) else None,
+    ]
+
+
+def _decode_message(fields: list) -> BaseMessage:
+    kind, content, id_, name, additional_kwargs, response_metadata, usage_metadata = fields
+    kwargs: dict[str, Any] = {"content": content, "id": id_, "name": name}
+    if additional_kwargs:
+        kwargs["additional_kwargs"] = additional_kwargs
+    if response_metadata:
+        kwargs["response_metadata"] = response_metadata
+    if usage_metadata:
+        kwargs["usage_metadata"] = usage_metadata
+    return _CLASSES[kind](**kwargs)
+
+
+class CompactSerializer:
+    """
+    Checkpoint serializer with a schema-aware encoding of message lists.
+
+    - Lists of plain Human/AI/System messages (the messages channel and its
+      writes) are encoded as positional msgpack arrays, without the class
+      path and field names the default serializer repeats for every message.
+    - Everything else is delegated to the default JsonPlusSerializer.
+    - Payloads above compress_min_bytes are zstd-compressed when the optional
+      zstandard package is installed (type tag gets a "+zstd" suffix).
+
+    Loading accepts every type the default serializer produces, so existing
+    checkpoints stay readable.
+    """
+
+    def __init__(self, compress_min_bytes: int = 4096, fallback: JsonPlusSerializer | None = None):
+        self.fallback = fallback or JsonPlusSerializer()
+        # 0 disables compression; so does a missing zstandard package
+        self.compress_min_bytes = compress_min_bytes if zstandard is not None and compress_min_bytes > 0 else None
+        self._compressor = zstandard.ZstdCompressor(level=3) if zstandard is not None else None
+        self._decompressor = zstandard.ZstdDecompressor() if zstandard is not None else None
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = self._dumps(obj)
+        if self.compress_min_bytes is not None and len(data) >= self.compress_min_bytes:
+            return type_ + ZSTD_SUFFIX, self._compressor.compress(data)
+        return type_, data
+
+    def _dumps(self, obj: Any) -> tuple[str, bytes]:
+        if isinstance(obj, list) and obj and all(_encodable(m) for m in obj):
+            try:
+                return MESSAGES_TYPE, ormsgpack.packb([_encode_message(m) for m in obj])
+            except TypeError:
+                # Non-primitive values in metadata; let the default serializer handle them
+                pass
+        return self.fallback.dumps_typed(obj)
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.endswith(ZSTD_SUFFIX):
+            if self._decompressor is None:
+                raise RuntimeError("Checkpoint is zstd-compressed but the zstandard package is not installed")
+            type_ = type_[: -len(ZSTD_SUFFIX)]
+            payload = self._decompressor.decompress(payload)
+        if type_ == MESSAGES_TYPE:
+            return [_decode_message(fields) for fields in ormsgpack.unpackb(payload)]
+        return self.fallback.loads_typed((type_, payload))
@@ -4,11 +4,20 @@ from whatsapp_agent.integrations.evolution_client import EvolutionClient, evolut
 from whatsapp_agent.integrations.evolution_normalize import (
     IncomingMessage,
     normalize_webhook_payload,
+    normalize_message_data,
 )
+from whatsapp_agent.integrations.evolution_history import iter_history_file, iter_history_messages, read_event
+from whatsapp_agent.integrations.outbound import OutboundScheduler, outbound_scheduler
 
 __all__ = [
     "EvolutionClient",
     "evolution_client",
     "IncomingMessage",
     "normalize_webhook_payload",
+    "normalize_message_data",
+    "iter_history_file",
+    "iter_history_messages",
+    "read_event",
+    "OutboundScheduler",
+    "outbound_scheduler",
 ]
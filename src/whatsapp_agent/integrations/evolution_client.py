@@ -65,6 +65,33 @@ class EvolutionClient:
             response.raise_for_status()
             return response.json()
 
+    async def find_messages(self, remote_jid: str, from_me: bool | None = None, limit: int = 50) -> list[dict]:
+        """
+        Recent messages of a chat from Evolution's message store.
+        
+        Args:
+            remote_jid: The chat JID
+            from_me: Only messages sent (True) or received (False) by the account; None for both
+            limit: Maximum number of records
+            
+        Returns:
+            Raw message records (key, message, messageTimestamp, ...)
+        """
+        url = f"{self.base_url}/chat/findMessages/{self.instance}"
+        key: dict = {"remoteJid": remote_jid}
+        if from_me is not None:
+            key["fromMe"] = from_me
+        payload = {"where": {"key": key}, "limit": limit}
+        
+        async with httpx.AsyncClient(timeout=30) as client:
+            response = await client.post(url, json=payload, headers=self._headers)
+            response.raise_for_status()
+            data = response.json()
+        # v2 pages the records under "messages"; v1 returns a plain list
+        if isinstance(data, dict):
+            data = (data.get("messages") or {}).get("records", [])
+        return [record for record in data if isinstance(record, dict)] if isinstance(data, list) else []
+
     async def mark_read(self, to: str, message_id: str) -> dict:
         """
         Mark a message as read.
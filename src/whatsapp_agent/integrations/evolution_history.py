@@ -0,0 +1,89 @@
+"""Stream message records out of Evolution history-sync payloads and export files."""
+
+import json
+from typing import Any, BinaryIO, Iterator
+
+try:
+    import ijson
+except ImportError:  # optional dependency: pip install "whatsapp-agent[history]"
+    ijson = None
+
+# Where message records live in the JSON shapes we accept:
+# - messages.set webhook payload:   {"event": "messages.set", "data": [...]}
+# - Baileys-style history payload:  {"data": {"messages": [...]}}
+# - export file:                    [...]
+RECORD_PREFIXES = {"data.item", "data.messages.item", "item"}
+
+
+def iter_history_messages(payload: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    """Yield message records from an already-parsed history payload."""
+    data = payload.get("data")
+    if isinstance(data, dict):
+        data = data.get("messages")
+    if isinstance(data, list):
+        yield from (record for record in data if isinstance(record, dict))
+
+
+def read_event(stream: BinaryIO) -> str | None:
+    """
+    The top-level "event" of a webhook payload. With ijson installed the rest of
+    the document is only read if "event" comes after it; otherwise it is all loaded.
+    """
+    if ijson is not None:
+        for prefix, event, value in ijson.parse(stream):
+            if prefix == "event" and event == "string":
+                return value
+        return None
+    document = json.load(stream)
+    return document.get("event") if isinstance(document, dict) else None
+
+
+def _iter_document(document: Any) -> Iterator[dict[str, Any]]:
+    """Yield message records from one parsed document: a record, a payload or a list of records."""
+    if isinstance(document, list):
+        yield from (record for record in document if isinstance(record, dict))
+    elif isinstance(document, dict):
+        if "key" in document:
+            yield document
+        else:
+            yield from iter_history_messages(document)
+
+
+def _stream_records(stream: BinaryIO) -> Iterator[dict[str, Any]]:
+    """Build message records from an ijson event stream, one record in memory at a time."""
+    builder = None
+    depth = 0
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        if builder is None:
+            if event != "start_map" or prefix not in RECORD_PREFIXES:
+                continue
+            builder = ijson.ObjectBuilder()
+        builder.event(event, value)
+        if event in ("start_map", "start_array"):
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+            if depth == 0:
+                yield builder.value
+                builder = None
+
+
+def iter_history_file(stream: BinaryIO, jsonl: bool = False) -> Iterator[dict[str, Any]]:
+    """
+    Yield message records from a history payload or export file.
+
+    - JSON Lines (jsonl=True): each line is a record, a payload or a list of
+      records; read line by line.
+    - JSON: parsed incrementally with ijson when installed, so memory stays
+      flat regardless of size; otherwise the whole document is loaded.
+    """
+    if jsonl:
+        for line in stream:
+            if line.strip():
+                yield from _iter_document(json.loads(line))
+        return
+
+    if ijson is not None:
+        yield from _stream_records(stream)
+    else:
+        yield from _iter_document(json.load(stream))
@@ -31,14 +31,22 @@ def normalize_webhook_payload(payload: dict[str, Any]) -> IncomingMessage | None
     if event != "messages.upsert":
         return None
 
-    data = payload.get("data", {})
+    return normalize_message_data(payload.get("data", {}))
 
+
+def normalize_message_data(data: dict[str, Any]) -> IncomingMessage | None:
+    """
+    Normalize a single Evolution/Baileys message record (the "data" of a
+    messages.upsert event, or one entry of a history sync).
+
+    Returns None for records without text content.
+    """
     # Check if this is a message we sent (operator message)
     key = data.get("key", {})
     from_me = key.get("fromMe", False)
 
     # Extract message content
-    message = data.get("message", {})
+    message = data.get("message") or {}
     
     # Try different message types for text content
     text = (
@@ -65,6 +73,16 @@ def normalize_webhook_payload(payload: dict[str, Any]) -> IncomingMessage | None
         sender=sender,
         text=text.strip(),
         is_group=is_group,
-        timestamp=data.get("messageTimestamp", 0),
+        timestamp=_timestamp(data.get("messageTimestamp", 0)),
         from_me=from_me,
     )
+
+
+def _timestamp(value: Any) -> int:
+    """messageTimestamp as epoch seconds (history records may carry a string or a Long {low, high})."""
+    if isinstance(value, dict):
+        return (value.get("high", 0) << 32) + (value.get("low", 0) & 0xFFFFFFFF)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
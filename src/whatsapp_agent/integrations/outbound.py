@@ -0,0 +1,349 @@
+"""Central outbound scheduler: rate-limited, fair sending through the Evolution API."""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+from whatsapp_agent.db import init_outbound_bucket, take_outbound_token, throttle_outbound_bucket
+from whatsapp_agent.settings import settings
+from whatsapp_agent.integrations.evolution_client import EvolutionClient, evolution_client
+
+logger = logging.getLogger(__name__)
+
+# Priority classes: lower is served first
+REPLY = 0
+PRESENCE = 1
+
+
+@dataclass
+class _Job:
+    call: Callable[[], Awaitable[Any]]
+    priority: int
+    weight: float
+    future: asyncio.Future
+    expires_at: float | None = None  # monotonic; stale jobs are dropped instead of sent
+    attempts: int = 0
+    dispatched_at: float = field(default=0.0)  # wall clock, compared across processes
+
+
+def _retry_after_seconds(response: httpx.Response) -> float:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), else the default."""
+    value = response.headers.get("retry-after")
+    if value:
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+        except (TypeError, ValueError):
+            pass
+    return settings.outbound_retry_after_seconds
+
+
+class OutboundScheduler:
+    """
+    Serializes all outbound calls for one Evolution instance.
+
+    - Token bucket: sends are spaced at `rate` per second with bursts up to
+      outbound_burst. The rate adapts AIMD-style: every success adds
+      outbound_rate_increase (up to outbound_rate_per_second), a 429 halves it
+      (down to outbound_min_rate_per_second) and pauses sending for Retry-After.
+    - Fairness: each chat has a FIFO queue with at most one call in flight, so
+      calls within a chat keep their order. Chat heads are served by priority
+      class (reply bubbles before presence pulses), then by weighted fair
+      queuing finish tag, so a chatty conversation can't starve the others.
+    - Presence pulses carry a deadline and are dropped once stale rather than
+      spending tokens that replies need.
+
+    A throttled call is requeued at the head of its chat and retried up to
+    outbound_max_attempts times before the error reaches the caller.
+
+    With outbound_shared_bucket the bucket (tokens, rate, Retry-After pause) lives
+    in a Postgres row per instance, so any number of containers share one send
+    rate and all back off on a 429; fairness and ordering stay per process. If
+    the database can't be reached, sends fall back to the local bucket.
+    """
+
+    def __init__(self, client: EvolutionClient | None = None, shared: bool | None = None):
+        self.client = client or evolution_client
+        self.shared = settings.outbound_shared_bucket if shared is None else shared
+        self._bucket_ready = False
+        self._rate_credit = 0.0  # increase earned since the last shared take
+        self.rate = settings.outbound_rate_per_second
+        self.tokens = float(settings.outbound_burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._decreased_at = 0.0
+
+        self._queues: dict[str, deque[_Job]] = {}
+        self._ready: list[tuple[int, float, int, str]] = []  # (priority, finish tag, seq, chat_id)
+        self._scheduled: set[str] = set()  # chats whose head is in _ready
+        self._busy: set[str] = set()  # chats with a call in flight
+        self._finish: dict[str, float] = {}  # last finish tag per chat
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._inflight: set[asyncio.Task] = set()
+
+        self.sent = 0
+        self.throttled = 0
+        self.dropped = 0
+
+    async def send_text(self, to: str, text: str) -> dict:
+        """Queue a reply bubble; returns the Evolution response once sent."""
+        return await self.submit(to, lambda: self.client.send_text(to, text), priority=REPLY)
+
+    async def set_typing(self, to: str, duration: int = 3000, expires_in: float | None = None) -> dict | None:
+        """Queue a presence pulse; returns None if it went stale (expires_in seconds) before a slot freed up."""
+        return await self.submit(
+            to,
+            lambda: self.client.set_typing(to, duration=duration),
+            priority=PRESENCE,
+            expires_in=expires_in,
+        )
+
+    async def submit(
+        self,
+        chat_id: str,
+        call: Callable[[], Awaitable[Any]],
+        priority: int = REPLY,
+        weight: float = 1.0,
+        expires_in: float | None = None,
+    ) -> Any:
+        """Queue call() behind the chat's earlier calls and wait for its result."""
+        self._ensure_started()
+        job = _Job(
+            call=call,
+            priority=priority,
+            weight=weight,
+            future=asyncio.get_running_loop().create_future(),
+            expires_at=time.monotonic() + expires_in if expires_in is not None else None,
+        )
+        self._queues.setdefault(chat_id, deque()).append(job)
+        self._schedule_head(chat_id)
+        return await job.future
+
+    def snapshot(self) -> dict:
+        return {
+            "shared_bucket": self.shared,
+            "rate_per_second": round(self.rate, 3),
+            # Shared: as of this process's last take
+            "tokens": round(self.tokens if self.shared else self._refill(time.monotonic()), 2),
+            "paused_for_seconds": round(max(self._paused_until - time.monotonic(), 0.0), 1),
+            "queued": sum(len(q) for q in self._queues.values()),
+            "chats_queued": len(self._queues),
+            "sent_total": self.sent,
+            "throttled_total": self.throttled,
+            "dropped_presence_total": self.dropped,
+        }
+
+    def start(self) -> None:
+        """Start the dispatcher on the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._task is not None:
+            if self._task.get_loop() is loop and not self._task.done():
+                return
+            if self._task.get_loop() is not loop:
+                # Previous loop is gone (e.g. a new asyncio.run); its queued callers went with it
+                self._reset_queues()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _ensure_started(self) -> None:
+        # Workers also run outside the API lifespan (e.g. Modal functions)
+        if self._task is None or self._task.done() or self._task.get_loop() is not asyncio.get_running_loop():
+            self.start()
+
+    def _reset_queues(self) -> None:
+        self._queues.clear()
+        self._ready.clear()
+        self._scheduled.clear()
+        self._busy.clear()
+        self._finish.clear()
+        self._inflight.clear()
+
+    async def _take_token(self) -> float:
+        """Take a send token; returns 0 if taken, else the seconds to wait for one."""
+        if self.shared:
+            try:
+                return await self._take_shared_token()
+            except Exception as e:
+                logger.warning(f"Shared outbound bucket unavailable, using the local one: {e}")
+        now = time.monotonic()
+        tokens = self._refill(now)
+        delay = max(self._paused_until - now, (1.0 - tokens) / self.rate if tokens < 1 else 0.0)
+        if delay <= 0:
+            self.tokens -= 1
+        return delay
+
+    async def _take_shared_token(self) -> float:
+        instance = self.client.instance
+        if not self._bucket_ready:
+            await init_outbound_bucket(instance, settings.outbound_burst, settings.outbound_rate_per_second)
+            self._bucket_ready = True
+        credit, self._rate_credit = self._rate_credit, 0.0
+        row = await take_outbound_token(
+            instance,
+            settings.outbound_burst,
+            settings.outbound_min_rate_per_second,
+            settings.outbound_rate_per_second,
+            credit,
+        )
+        if row is None:
+            # Row deleted under us: recreate it on the next take
+            self._bucket_ready = False
+            return 0.1
+        delay, self.tokens, self.rate = row
+        return delay
+
+    def _refill(self, now: float) -> float:
+        # No tokens accrue while paused after a 429
+        elapsed = now - max(self._refilled_at, self._paused_until)
+        if elapsed > 0:
+            self.tokens = min(self.tokens + elapsed * self.rate, settings.outbound_burst)
+        self._refilled_at = now
+        return self.tokens
+
+    def _schedule_head(self, chat_id: str) -> None:
+        """Put the chat's next call in the ready heap unless one is already there or in flight."""
+        queue = self._queues.get(chat_id)
+        if not queue:
+            self._queues.pop(chat_id, None)
+            if chat_id not in self._busy and self._finish.get(chat_id, 0.0) <= self._virtual_time:
+                self._finish.pop(chat_id, None)
+            return
+        if chat_id in self._busy or chat_id in self._scheduled:
+            return
+        head = queue[0]
+        finish = max(self._virtual_time, self._finish.get(chat_id, 0.0)) + 1.0 / head.weight
+        self._finish[chat_id] = finish
+        heapq.heappush(self._ready, (head.priority, finish, next(self._sequence), chat_id))
+        self._scheduled.add(chat_id)
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            if not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            if self._drop_stale_head():
+                continue
+
+            delay = await self._take_token()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            if not self._ready or self._drop_stale_head():
+                # Went stale while the token was taken; the token is spent
+                continue
+
+            _, finish, _, chat_id = heapq.heappop(self._ready)
+            self._scheduled.discard(chat_id)
+            job = self._queues[chat_id].popleft()
+            self._virtual_time = max(self._virtual_time, finish)
+
+            job.attempts += 1
+            job.dispatched_at = time.time()
+            self._busy.add(chat_id)
+            task = asyncio.create_task(self._execute(chat_id, job))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    def _drop_stale_head(self) -> bool:
+        """Settle the next call without sending if its caller went away or it expired."""
+        _, finish, _, chat_id = self._ready[0]
+        job = self._queues[chat_id][0]
+        cancelled = job.future.done()
+        expired = job.expires_at is not None and time.monotonic() > job.expires_at
+        if not cancelled and not expired:
+            return False
+
+        heapq.heappop(self._ready)
+        self._scheduled.discard(chat_id)
+        self._queues[chat_id].popleft()
+        self._virtual_time = max(self._virtual_time, finish)
+        if not cancelled:
+            self.dropped += 1
+            job.future.set_result(None)
+        self._schedule_head(chat_id)
+        return True
+
+    async def _execute(self, chat_id: str, job: _Job) -> None:
+        try:
+            result = await job.call()
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 429:
+                await self._on_throttled(job, e.response)
+                if job.attempts < settings.outbound_max_attempts and not job.future.done():
+                    self._queues.setdefault(chat_id, deque()).appendleft(job)
+                    return
+            if not job.future.done():
+                job.future.set_exception(e)
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            self.sent += 1
+            self.rate = min(self.rate + settings.outbound_rate_increase, settings.outbound_rate_per_second)
+            self._rate_credit += settings.outbound_rate_increase
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._busy.discard(chat_id)
+            self._schedule_head(chat_id)
+
+    async def _on_throttled(self, job: _Job, response: httpx.Response) -> None:
+        """Back off: pause for Retry-After and cut the rate once per throttling episode."""
+        self.throttled += 1
+        now = time.monotonic()
+        retry_after = _retry_after_seconds(response)
+        self._paused_until = max(self._paused_until, now + retry_after)
+        self.tokens = 0.0
+        self._refilled_at = now
+        # Calls dispatched before the last cut were sent at the old rate; don't cut again for them
+        cut = job.dispatched_at >= self._decreased_at
+        if cut:
+            self.rate = max(self.rate * settings.outbound_rate_decrease, settings.outbound_min_rate_per_second)
+            self._decreased_at = time.time()
+        if self.shared:
+            # Other processes must back off too; the shared row decides the episode
+            try:
+                row = await throttle_outbound_bucket(
+                    self.client.instance,
+                    retry_after,
+                    datetime.fromtimestamp(job.dispatched_at, timezone.utc),
+                    settings.outbound_rate_decrease,
+                    settings.outbound_min_rate_per_second,
+                )
+                if row is not None:
+                    self.rate, cut = row
+            except Exception as e:
+                logger.warning(f"Could not record throttling in the shared outbound bucket: {e}")
+        if cut:
+            logger.warning(f"Evolution API throttled; pausing {retry_after:.1f}s, rate now {self.rate:.2f}/s")
+
+
+# Scheduler for the default Evolution instance
+outbound_scheduler = OutboundScheduler()
@@ -0,0 +1,172 @@
+"""
+Structured, sampled logging with formatting and I/O off the event loop.
+
+- log_event() attaches an event name and fields to a record and returns
+  without formatting anything; disabled levels and sampled-out events
+  (LOG_SAMPLE_RATES) cost a dict lookup.
+- configure_logging() puts a queue handler on the root logger; a listener
+  thread formats records (text or JSON lines, LOG_FORMAT) and writes them.
+- Message text wrapped in MessageText is redacted or HMAC-hashed
+  (LOG_MESSAGE_TEXT) when the record is rendered, never stored raw in logs.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from typing import Any
+
+from whatsapp_agent.settings import settings
+
+# Hash key for MessageText; a per-process key still lets lines about the same text be correlated
+_HASH_KEY = settings.log_hash_key.encode() if settings.log_hash_key else os.urandom(32)
+
+_listener: logging.handlers.QueueListener | None = None
+_replaced_handlers: list[logging.Handler] = []
+
+
+class MessageText:
+    """Message content in a log record, rendered according to LOG_MESSAGE_TEXT only when formatted."""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __str__(self) -> str:
+        mode = settings.log_message_text
+        if mode == "full":
+            return self.text
+        if mode == "hash":
+            digest = hmac.new(_HASH_KEY, self.text.encode(), hashlib.sha256).hexdigest()[:16]
+            return f"hmac:{digest} len={len(self.text)}"
+        return f"<redacted len={len(self.text)}>"
+
+
+def log_event(
+    logger: logging.Logger,
+    event: str,
+    level: int = logging.INFO,
+    exc_info: bool = False,
+    **fields: Any,
+) -> None:
+    """
+    Log a structured event, e.g. log_event(logger, "reply.part_sent", chat_id=chat_id, part=2).
+
+    Fields are stored as-is and rendered by the formatter; pass message text
+    as MessageText(text). Events with a LOG_SAMPLE_RATES entry below 1 are
+    kept with that probability and carry a sample_rate field for scaling counts.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    rate = settings.log_sample_rates.get(event)
+    if rate is not None and rate < 1.0:
+        if random.random() >= rate:
+            return
+        fields["sample_rate"] = rate
+    # Build the record directly: Logger.log() would also walk the stack for the caller's file/line
+    record = logger.makeRecord(
+        logger.name,
+        level,
+        "(event)",
+        0,
+        event,
+        None,
+        sys.exc_info() if exc_info else None,
+        extra={"event": event, "fields": fields},
+    )
+    logger.handle(record)
+
+
+def _render(value: Any) -> Any:
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formats records as "time LEVEL logger: event key=value ..." or as one JSON object per line."""
+
+    def __init__(self, json_lines: bool = False):
+        super().__init__()
+        self.json_lines = json_lines
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", None) or {}
+        message = record.getMessage()
+
+        if self.json_lines:
+            entry = {
+                "ts": self.formatTime(record),
+                "level": record.levelname,
+                "logger": record.name,
+                "event" if hasattr(record, "event") else "message": message,
+                **{key: _render(value) for key, value in fields.items()},
+            }
+            if record.exc_info:
+                entry["exc"] = self.formatException(record.exc_info)
+            return json.dumps(entry, ensure_ascii=False)
+
+        line = f"{self.formatTime(record)} {record.levelname} {record.name}: {message}"
+        if fields:
+            line += " " + " ".join(f"{key}={_render(value)}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that enqueues records untouched.
+    The stock prepare() formats the message on the calling thread; here the
+    listener thread does it (records never leave the process, so nothing
+    needs to be picklable).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging() -> None:
+    """
+    Route root logging through a queue to a listener thread that formats and
+    writes to stderr. Replaces the root handlers until stop_logging(). Idempotent.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(StructuredFormatter(json_lines=settings.log_format == "json"))
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+
+    root = logging.getLogger()
+    _replaced_handlers[:] = root.handlers
+    for existing in _replaced_handlers:
+        root.removeHandler(existing)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(settings.log_level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Flush queued records, stop the listener thread and restore the previous root handlers."""
+    global _listener
+    if _listener is None:
+        return
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, DeferredQueueHandler):
+            root.removeHandler(handler)
+    _listener.stop()
+    _listener = None
+    for handler in _replaced_handlers:
+        root.addHandler(handler)
+    _replaced_handlers.clear()
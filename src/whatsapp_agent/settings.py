@@ -19,6 +19,16 @@ class Settings(BaseSettings):
     openrouter_api_key: str
     openrouter_model: str = "openai/gpt-5.2"
 
+    # Model routing: simple turns go to the fast model (disabled when unset)
+    openrouter_fast_model: str | None = None
+    routing_fast_max_chars: int = 280
+    routing_fast_max_questions: int = 1
+    routing_fast_min_history: int = 3  # first contact goes to the main model
+    routing_main_keywords: list[str] = [
+        "contract", "invoice", "payment", "price", "quote", "proposal", "legal", "urgent", "deadline",
+    ]
+    routing_fast_timeout_seconds: float = 8.0
+
     # Evolution API
     evolution_api_url: str
     evolution_api_key: str
@@ -26,6 +36,70 @@ class Settings(BaseSettings):
 
     # Agent behavior
     debounce_seconds: int = 10
+    history_max_chars: int = 6000  # conversation history sent to the LLM, most recent first
+
+    # Adaptive debounce: per-chat quiet period learned from typing cadence
+    adaptive_debounce_enabled: bool = False
+    debounce_floor_seconds: float = 2.0
+    debounce_ceiling_seconds: float = 15.0
+    debounce_percentile: float = 0.9
+    debounce_min_samples: int = 8
+
+    # Speculative generation during the debounce window (opt-in)
+    speculative_enabled: bool = False
+    speculative_start_seconds: float = 2.0  # pause before speculating on the batch so far
+    speculative_poll_seconds: float = 1.0
+
+    # Outbound scheduler (per Evolution instance): token bucket with AIMD on 429s
+    outbound_shared_bucket: bool = True  # one bucket in Postgres for all processes, else per process
+    outbound_rate_per_second: float = 1.0  # ceiling the rate recovers to
+    outbound_min_rate_per_second: float = 0.1
+    outbound_burst: int = 5
+    outbound_rate_increase: float = 0.02  # added per successful call
+    outbound_rate_decrease: float = 0.5  # multiplier on 429
+    outbound_retry_after_seconds: float = 10.0  # pause when a 429 has no Retry-After
+    outbound_max_attempts: int = 3
+
+    # Reply plans: a plan is abandoned (inbound marked processed) past either limit
+    reply_plan_max_attempts: int = 3  # send attempts for any one part
+    reply_plan_max_age_seconds: float = 600.0  # older replies would arrive stale
+
+    # History import: most recent messages per chat used to seed its LangGraph thread
+    history_seed_messages: int = 50
+    history_max_body_bytes: int = 256 * 1024 * 1024  # largest webhook body (history syncs), else 413
+
+    # Load shedding: webhook admission control and /ready
+    max_inflight_tasks: int = 50
+    max_pool_wait_ms: float = 500.0
+    max_loop_lag_ms: float = 200.0
+    shed_reject_factor: float = 2.0  # load ratio at which the webhook returns 503 instead of deferring
+    shed_retry_after_seconds: int = 5
+    orphan_sweep_seconds: float = 30.0  # how often to look for unprocessed chats no worker holds
+    orphan_grace_seconds: float = 30.0  # newest unprocessed message must be at least this old
+
+    # Stats API: /stats routes list chat IDs (phone numbers); disabled unless a key is set
+    stats_api_key: str | None = None  # sent in the X-API-Key header
+
+    # Logging: queue-based structured records (see whatsapp_agent.logs)
+    log_level: str = "INFO"
+    log_format: str = "text"  # "text" or "json" (one object per line)
+    log_message_text: str = "redact"  # "redact", "hash" (HMAC with log_hash_key) or "full"
+    log_hash_key: str | None = None  # unset = random per process
+    log_sample_rates: dict[str, float] = {  # fraction of each event type kept; unlisted = 1
+        "webhook.received": 0.1,
+        "reply.typing": 0.1,
+        "reply.pause": 0.1,
+        "debounce.wait": 0.1,
+    }
+
+    # Checkpoint cache (in-memory, write-through in front of Postgres)
+    checkpoint_cache_enabled: bool = True
+    checkpoint_cache_max_bytes: int = 64 * 1024 * 1024
+    checkpoint_cache_idle_seconds: int = 1800
+
+    # Checkpoint serialization (compact message encoding, zstd above threshold; 0 = no compression)
+    checkpoint_compact_serde: bool = True
+    checkpoint_compress_min_bytes: int = 4096
 
 
 settings = Settings()
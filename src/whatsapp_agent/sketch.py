@@ -0,0 +1,64 @@
+"""Compact log-bucketed histogram sketch, stored as an integer array in Postgres."""
+
+import math
+
+
+class LogHistogram:
+    """
+    Fixed-layout histogram with logarithmically spaced buckets.
+
+    Counts are plain lists of ints so they can be stored in an INTEGER[]
+    column and merged by element-wise addition. Values below min_value land in
+    the first bucket, values above max_value in the last. Quantiles return the
+    upper bound of the bucket that contains them (relative error is bounded by
+    the bucket growth factor).
+    """
+
+    def __init__(self, min_value: float, max_value: float, buckets_per_doubling: int = 4):
+        self.min_value = min_value
+        self.max_value = max_value
+        self.growth = 2 ** (1 / buckets_per_doubling)
+        self.size = math.ceil(math.log(max_value / min_value, self.growth)) + 1
+
+    def empty(self) -> list[int]:
+        return [0] * self.size
+
+    def bucket(self, value: float) -> int:
+        """Bucket index for a value."""
+        if value <= self.min_value:
+            return 0
+        index = math.ceil(math.log(value / self.min_value, self.growth))
+        return min(index, self.size - 1)
+
+    def upper_bound(self, index: int) -> float:
+        """Upper bound of a bucket."""
+        return min(self.min_value * self.growth ** index, self.max_value)
+
+    def add(self, counts: list[int], values: list[float]) -> list[int]:
+        """Return counts with values added. Resets counts whose layout doesn't match."""
+        counts = list(counts) if len(counts) == self.size else self.empty()
+        for value in values:
+            counts[self.bucket(value)] += 1
+        return counts
+
+    def merge(self, left: list[int], right: list[int]) -> list[int]:
+        return [a + b for a, b in zip(left, right)]
+
+    def decay(self, counts: list[int], max_total: int) -> list[int]:
+        """Halve all counts once the total exceeds max_total, so recent samples dominate."""
+        if sum(counts) <= max_total:
+            return counts
+        return [c // 2 for c in counts]
+
+    def quantile(self, counts: list[int], q: float) -> float | None:
+        """Approximate q-quantile (0..1), or None if the histogram is empty."""
+        total = sum(counts)
+        if total == 0:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank and count:
+                return self.upper_bound(index)
+        return self.upper_bound(self.size - 1)
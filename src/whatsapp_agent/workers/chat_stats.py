@@ -0,0 +1,70 @@
+"""Per-chat stats rollup, updated as the worker finishes each batch."""
+
+import logging
+from datetime import datetime, timezone
+
+from whatsapp_agent.sketch import LogHistogram
+from whatsapp_agent.db import add_chat_stats
+
+logger = logging.getLogger(__name__)
+
+# Reply latencies between 0.5s and 1 hour, ~19% bucket width (53 buckets)
+LATENCY_HISTOGRAM = LogHistogram(min_value=0.5, max_value=3600.0, buckets_per_doubling=4)
+
+LATENCY_QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+
+
+async def record_batch(chat_id: str, answered: list[tuple[datetime, bool]], reply_parts: int = 0) -> None:
+    """
+    Add a processed batch, as (received_at, is_from_me) tuples, to the chat's rollup.
+
+    With reply_parts > 0 the batch was answered just now: the reply is counted
+    and its latency measured from the batch's last user message. Runs after the
+    batch is marked processed, so a retried batch is never counted twice.
+    Failures are logged, not raised: stats never fail a reply.
+    """
+    if not answered:
+        return
+    now = datetime.now(timezone.utc)
+    user_times = [received_at for received_at, is_from_me in answered if not is_from_me]
+
+    latency = None
+    if reply_parts and user_times:
+        latency = max((now - max(user_times)).total_seconds(), 0.0)
+
+    try:
+        await add_chat_stats(
+            chat_id,
+            user_messages=len(user_times),
+            operator_messages=len(answered) - len(user_times),
+            replies=1 if reply_parts else 0,
+            reply_parts=reply_parts,
+            last_inbound_at=max(received_at for received_at, _ in answered),
+            last_reply_at=now if reply_parts else None,
+            latency_seconds=latency,
+            latency_histogram=LATENCY_HISTOGRAM.add(LATENCY_HISTOGRAM.empty(), [latency]) if latency is not None else None,
+        )
+    except Exception as e:
+        logger.warning(f"Failed to update chat stats for {chat_id}: {e}")
+
+
+def summarize(row: dict) -> dict:
+    """Render a rollup row (or totals plus a histogram) for the stats API."""
+    histogram = row.get("latency_histogram") or []
+    latency_count = row["latency_count"]
+    messages = row["user_messages"] + row["operator_messages"]
+    outgoing = row["operator_messages"] + row["reply_parts"]
+
+    summary = {key: value for key, value in row.items() if key != "latency_histogram"}
+    summary["messages"] = messages
+    # Share of outgoing bubbles written by the operator vs the bot
+    summary["operator_share"] = round(row["operator_messages"] / outgoing, 3) if outgoing else None
+    summary["bot_share"] = round(row["reply_parts"] / outgoing, 3) if outgoing else None
+    summary["latency_avg_seconds"] = (
+        round(row["latency_sum_seconds"] / latency_count, 2) if latency_count else None
+    )
+    if len(histogram) == LATENCY_HISTOGRAM.size:
+        for label, q in LATENCY_QUANTILES.items():
+            value = LATENCY_HISTOGRAM.quantile(histogram, q)
+            summary[f"latency_{label}_seconds"] = round(value, 2) if value is not None else None
+    return summary
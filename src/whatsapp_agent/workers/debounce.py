@@ -0,0 +1,103 @@
+"""Adaptive per-chat debounce based on each sender's observed typing cadence."""
+
+from datetime import datetime
+
+from whatsapp_agent.settings import settings
+from whatsapp_agent.sketch import LogHistogram
+from whatsapp_agent.db import get_chat_cadence, upsert_chat_cadence
+
+# Gaps between 0.25s and 2 minutes, ~19% bucket width (37 buckets).
+# Longer gaps are a new conversation, not typing cadence, and are not recorded.
+GAP_HISTOGRAM = LogHistogram(min_value=0.25, max_value=120.0, buckets_per_doubling=4)
+
+# Halve the histogram once it holds this many samples so recent behaviour dominates
+MAX_GAP_SAMPLES = 200
+
+
+class ChatCadence:
+    """
+    Gap histogram for one chat, plus when its last batch's last user message
+    arrived and when that batch was answered.
+    """
+
+    def __init__(
+        self,
+        gap_histogram: list[int] | None = None,
+        last_user_message_at: datetime | None = None,
+        answered_at: datetime | None = None,
+    ):
+        self.gap_histogram = gap_histogram or GAP_HISTOGRAM.empty()
+        self.last_user_message_at = last_user_message_at
+        self.answered_at = answered_at
+
+    @property
+    def sample_count(self) -> int:
+        return sum(self.gap_histogram)
+
+    def quiet_period(self, last_text: str, last_is_from_me: bool) -> float:
+        """
+        Seconds to wait after the last message before replying.
+
+        - Fixed settings.debounce_seconds until enough gaps are observed
+        - Otherwise the configured percentile of this sender's gaps,
+          clamped to [debounce_floor_seconds, debounce_ceiling_seconds]
+        - A user message ending in a question fires after the floor
+        """
+        if not last_is_from_me and last_text.rstrip().endswith("?"):
+            return settings.debounce_floor_seconds
+        if self.sample_count < settings.debounce_min_samples:
+            return settings.debounce_seconds
+        gap = GAP_HISTOGRAM.quantile(self.gap_histogram, settings.debounce_percentile)
+        return min(max(gap, settings.debounce_floor_seconds), settings.debounce_ceiling_seconds)
+
+    def record(self, batch: list[tuple[int, str, datetime, bool]]) -> None:
+        """
+        Add the gaps between consecutive user messages in a processed batch.
+
+        Gaps inside the batch are always typing cadence, but they are all shorter
+        than the quiet period in force, so on their own the estimate could only
+        shrink. The gap to the previous batch counts too when this batch's first
+        user message arrived before the previous one was answered: the sender
+        was still typing and that batch closed too early. Later messages follow
+        the bot's reply and the time spent reading it, which is not cadence.
+        """
+        gaps = []
+        previous = None
+        for _, _, received_at, is_from_me in batch:
+            if is_from_me:
+                continue
+            if previous is None and self._split_from_previous(received_at):
+                previous = self.last_user_message_at
+            if previous is not None:
+                gap = (received_at - previous).total_seconds()
+                if 0 <= gap <= GAP_HISTOGRAM.max_value:
+                    gaps.append(gap)
+            previous = received_at
+
+        self.gap_histogram = GAP_HISTOGRAM.decay(
+            GAP_HISTOGRAM.add(self.gap_histogram, gaps), MAX_GAP_SAMPLES
+        )
+        if previous is not None:
+            self.last_user_message_at = previous
+        self.answered_at = None
+
+    def answered(self, at: datetime) -> None:
+        """Note that the last recorded batch was answered (replied to, or handled by the operator)."""
+        self.answered_at = at
+
+    def _split_from_previous(self, received_at: datetime) -> bool:
+        return (
+            self.last_user_message_at is not None
+            and self.answered_at is not None
+            and received_at < self.answered_at
+        )
+
+
+async def load_cadence(chat_id: str) -> ChatCadence:
+    """Load a chat's cadence (empty if never recorded)."""
+    row = await get_chat_cadence(chat_id)
+    return ChatCadence(*row) if row else ChatCadence()
+
+
+async def save_cadence(chat_id: str, cadence: ChatCadence) -> None:
+    await upsert_chat_cadence(chat_id, cadence.gap_histogram, cadence.last_user_message_at, cadence.answered_at)
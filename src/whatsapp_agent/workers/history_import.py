@@ -0,0 +1,169 @@
+"""
+Bulk import of Evolution history sync (messages.set) payloads and export files.
+
+Messages are normalized incrementally, COPY-loaded into inbound_messages
+already marked processed, and the most recent ones per chat seed that
+chat's LangGraph thread so new deployments start with context.
+
+CLI:
+    python -m whatsapp_agent.workers.history_import export.json
+    python -m whatsapp_agent.workers.history_import export.jsonl --jsonl --no-seed
+"""
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import datetime, timezone
+from typing import Any, Iterable, Iterator
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from whatsapp_agent.settings import settings
+from whatsapp_agent.db import advisory_lock, copy_inbound_messages, init_pool, close_pool
+from whatsapp_agent.integrations import IncomingMessage, iter_history_file, normalize_message_data
+from whatsapp_agent.workers.process_chat import get_graph_app
+
+logger = logging.getLogger(__name__)
+
+# Rows per COPY batch
+IMPORT_CHUNK_ROWS = 5000
+
+# Pseudo-chats that are never conversations
+SKIPPED_CHATS = {"status@broadcast"}
+
+
+def _received_at(message: IncomingMessage) -> datetime:
+    if message.timestamp:
+        return datetime.fromtimestamp(message.timestamp, tz=timezone.utc)
+    return datetime.now(timezone.utc)
+
+
+def _to_langchain(received_at: datetime, message: IncomingMessage) -> BaseMessage:
+    """Same mapping as the live path: operator -> AIMessage, user -> HumanMessage."""
+    message_cls = AIMessage if message.from_me else HumanMessage
+    return message_cls(
+        content=message.text,
+        id=f"history:{message.message_id}",
+        additional_kwargs={"received_at": received_at.isoformat()},
+    )
+
+
+async def seed_threads(recent: dict[str, list[tuple[datetime, int, IncomingMessage]]]) -> int:
+    """
+    Seed the LangGraph thread of each chat that has no state yet with its most
+    recent history (one checkpoint write per chat). Returns the number seeded.
+
+    Each chat's check-and-write runs under its advisory lock, like the worker,
+    so live messages arriving during the sync can't interleave with it. A chat
+    whose lock stays busy is being answered, so its thread gets state anyway
+    and is skipped.
+    """
+    graph_app = await get_graph_app()
+    seeded = 0
+    for chat_id, entries in recent.items():
+        config = {"configurable": {"thread_id": f"wa:{chat_id}"}}
+        try:
+            async with advisory_lock(chat_id):
+                state = await graph_app.aget_state(config)
+                if state.values.get("messages"):
+                    continue
+                messages = [_to_langchain(received_at, message) for received_at, _, message in sorted(entries)]
+                await graph_app.aupdate_state(
+                    config,
+                    {"user_id": chat_id, "messages": messages},
+                    as_node="agent",
+                )
+                seeded += 1
+        except TimeoutError:
+            logger.info(f"History import: {chat_id} is being processed, not seeding its thread")
+    return seeded
+
+
+def _build_chunks(
+    records: Iterable[dict[str, Any]],
+    recent: dict[str, list[tuple[datetime, int, IncomingMessage]]],
+    stats: dict,
+) -> Iterator[list[tuple[str, str, str, bool, datetime]]]:
+    """
+    Normalize records into COPY rows, yielding IMPORT_CHUNK_ROWS at a time.
+    Keeps the newest history_seed_messages messages per chat in recent (min-heaps)
+    and counts records and messages in stats.
+    """
+    sequence = itertools.count()  # tie-breaker so heap entries never compare messages
+    chunk: list[tuple[str, str, str, bool, datetime]] = []
+
+    for record in records:
+        stats["records"] += 1
+        message = normalize_message_data(record)
+        if message is None or not message.message_id or not message.chat_id or message.chat_id in SKIPPED_CHATS:
+            continue
+        stats["messages"] += 1
+
+        received_at = _received_at(message)
+        chunk.append((message.chat_id, message.message_id, message.text, message.from_me, received_at))
+
+        heap = recent.setdefault(message.chat_id, [])
+        entry = (received_at, next(sequence), message)
+        if len(heap) < settings.history_seed_messages:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+        if len(chunk) >= IMPORT_CHUNK_ROWS:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+async def import_history(records: Iterable[dict[str, Any]], seed: bool = True) -> dict:
+    """
+    Import raw Evolution message records.
+    Returns counts: records seen, text messages, rows inserted, chats, threads seeded.
+
+    Reading and parsing the records and building each chunk run in a worker
+    thread (records may be a stream over a file); only the COPY of each chunk
+    runs on the event loop.
+    """
+    stats = {"records": 0, "messages": 0, "inserted": 0, "chats": 0, "seeded": 0}
+    # Per chat, a min-heap of the newest history_seed_messages messages
+    recent: dict[str, list[tuple[datetime, int, IncomingMessage]]] = {}
+    chunks = _build_chunks(records, recent, stats)
+
+    while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+        stats["inserted"] += await copy_inbound_messages(chunk)
+        logger.info(f"History import: {stats['messages']} messages processed")
+    stats["chats"] = len(recent)
+
+    if seed and recent and settings.history_seed_messages > 0:
+        stats["seeded"] = await seed_threads(recent)
+
+    logger.info(f"History import finished: {stats}")
+    return stats
+
+
+async def import_history_file(path: str, jsonl: bool = False, seed: bool = True) -> dict:
+    """Import a history payload or export file from disk."""
+    with open(path, "rb") as stream:
+        return await import_history(iter_history_file(stream, jsonl=jsonl), seed=seed)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    await init_pool()
+    try:
+        stats = await import_history_file(args.path, jsonl=args.jsonl, seed=not args.no_seed)
+    finally:
+        await close_pool()
+    print(stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import Evolution history into inbound_messages")
+    parser.add_argument("path", help="messages.set payload, JSON export, or JSON Lines file")
+    parser.add_argument("--jsonl", action="store_true", help="input is JSON Lines")
+    parser.add_argument("--no-seed", action="store_true", help="don't seed LangGraph threads")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,153 @@
+"""Process load tracking and admission control for the webhook."""
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator
+
+from whatsapp_agent.settings import settings
+from whatsapp_agent.db import get_orphaned_chats, get_pool_wait_ms
+
+logger = logging.getLogger(__name__)
+
+# Admission decisions
+ACCEPT = "accept"
+DEFER = "defer"
+REJECT = "reject"
+
+# Event loop lag sampling
+LAG_INTERVAL_SECONDS = 0.25
+LAG_ALPHA = 0.3
+
+
+class LoadMonitor:
+    """
+    Tracks in-flight worker tasks, DB pool wait and event-loop lag.
+
+    The load ratio is the worst of the three signals relative to its limit.
+    Below 1 work is accepted; up to shed_reject_factor new messages are
+    persisted but their processing is deferred until load drops; above that
+    the webhook rejects with a retryable status.
+
+    Deferred chat IDs are only a local hint for prompt draining. The database
+    is the source of truth: every orphan_sweep_seconds (and at startup) chats
+    with unprocessed messages that no worker holds are queued as well, so work
+    deferred by a process that restarted or scaled down is not lost.
+    """
+
+    def __init__(self):
+        self.inflight = 0
+        self.loop_lag_ms = 0.0
+        self.deferred: dict[str, None] = {}  # insertion-ordered set of chat_ids to dispatch
+        self.shed_count = 0
+        self._last_sweep: float | None = None
+        self._task: asyncio.Task | None = None
+        self._dispatched: set[asyncio.Task] = set()
+        self._dispatch: Callable[[str], Awaitable[None]] | None = None
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """Count a worker task as in-flight for its duration."""
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+
+    def load_ratio(self) -> float:
+        return max(
+            self.inflight / settings.max_inflight_tasks,
+            get_pool_wait_ms() / settings.max_pool_wait_ms,
+            self.loop_lag_ms / settings.max_loop_lag_ms,
+        )
+
+    def admission(self) -> str:
+        """Decide what to do with a new inbound message."""
+        ratio = self.load_ratio()
+        if ratio < 1:
+            return ACCEPT
+        self.shed_count += 1
+        return DEFER if ratio < settings.shed_reject_factor else REJECT
+
+    def defer(self, chat_id: str) -> None:
+        """Remember a chat whose processing should start once load drops."""
+        self.deferred[chat_id] = None
+
+    def snapshot(self) -> dict:
+        ratio = self.load_ratio()
+        return {
+            "ready": ratio < 1,
+            "load_ratio": round(ratio, 3),
+            "inflight_tasks": self.inflight,
+            "pool_wait_ms": round(get_pool_wait_ms(), 1),
+            "loop_lag_ms": round(self.loop_lag_ms, 1),
+            "deferred_chats": len(self.deferred),
+            "shed_total": self.shed_count,
+        }
+
+    def start(self, dispatch: Callable[[str], Awaitable[None]]) -> None:
+        """
+        Start sampling loop lag and draining deferred chats with dispatch(chat_id).
+        The first orphan sweep runs right away, picking up work left by previous processes.
+        """
+        self._dispatch = dispatch
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            if self._last_sweep is None or time.monotonic() - self._last_sweep >= settings.orphan_sweep_seconds:
+                await self._sweep()
+            started = time.monotonic()
+            await asyncio.sleep(LAG_INTERVAL_SECONDS)
+            lag_ms = max((time.monotonic() - started - LAG_INTERVAL_SECONDS) * 1000, 0.0)
+            self.loop_lag_ms += LAG_ALPHA * (lag_ms - self.loop_lag_ms)
+            self._drain()
+
+    async def _sweep(self) -> None:
+        """Queue chats with unprocessed messages that no worker is handling."""
+        self._last_sweep = time.monotonic()
+        try:
+            chat_ids = await get_orphaned_chats(settings.orphan_grace_seconds, settings.max_inflight_tasks)
+        except Exception as e:
+            logger.warning(f"Orphaned chat sweep failed: {e}")
+            return
+        for chat_id in chat_ids:
+            self.deferred[chat_id] = None
+        if chat_ids:
+            logger.info(f"Queued {len(chat_ids)} chat(s) with unprocessed messages and no worker")
+
+    def _drain(self) -> None:
+        """
+        Dispatch one deferred chat per tick while there is headroom.
+        A dispatched task only counts as in-flight once it starts running,
+        so draining gradually avoids overshooting the limits.
+        """
+        if not self.deferred or self.load_ratio() >= 1:
+            return
+        chat_id = next(iter(self.deferred))
+        del self.deferred[chat_id]
+        logger.info(f"Dispatching deferred chat {chat_id}")
+        task = asyncio.create_task(self._dispatch(chat_id))
+        self._dispatched.add(task)
+        task.add_done_callback(self._on_dispatched_done)
+
+    def _on_dispatched_done(self, task: asyncio.Task) -> None:
+        self._dispatched.discard(task)
+        # process_chat_task logs its own failures; retrieve to avoid "never retrieved" noise
+        if not task.cancelled():
+            task.exception()
+
+
+# Process-wide monitor
+load_monitor = LoadMonitor()
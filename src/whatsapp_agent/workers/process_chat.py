@@ -5,18 +5,26 @@ import logging
 import random
 from datetime import datetime, timezone
 
-from langchain_core.messages import HumanMessage, AIMessage
-
 from whatsapp_agent.settings import settings
 from whatsapp_agent.db import (
     advisory_lock,
-    get_last_message_time,
+    get_last_message,
     fetch_unprocessed_messages,
     mark_messages_processed,
-    insert_outbound_message,
+    create_reply_plan,
+    get_pending_reply_plan,
+    mark_reply_part_attempted,
+    mark_reply_part_delivered,
+    complete_reply_plan,
+    abandon_reply_plan,
 )
-from whatsapp_agent.graphs.whatsapp_bot import build_app, create_checkpointer
-from whatsapp_agent.integrations import evolution_client
+from whatsapp_agent.graphs.whatsapp_bot import batch_to_messages, build_app, create_checkpointer
+from whatsapp_agent.integrations import evolution_client, normalize_message_data, outbound_scheduler
+from whatsapp_agent.logs import MessageText, log_event
+from whatsapp_agent.workers.chat_stats import record_batch
+from whatsapp_agent.workers.debounce import load_cadence, save_cadence
+from whatsapp_agent.workers.load import load_monitor
+from whatsapp_agent.workers.speculative import Speculator
 
 logger = logging.getLogger(__name__)
 
@@ -24,12 +32,29 @@ logger = logging.getLogger(__name__)
 TYPING_MS_PER_CHAR = 50
 MIN_TYPING_MS = 2000
 MAX_TYPING_MS = 60000
+TYPING_PULSE_MS = 2500
+
+# Slack for clock differences when matching Evolution message timestamps to a plan's creation
+SENT_LOOKUP_SLACK_SECONDS = 60
 
 # Cache the compiled graph app
 _graph_app = None
 _checkpointer = None
 
 
+def split_reply(text: str) -> list[str]:
+    """Split an LLM reply into WhatsApp bubbles on the "|||" delimiter, dropping empty parts."""
+    return [m.strip() for m in text.split("|||") if m.strip()]
+
+
+def typing_duration_ms(reply_part: str) -> int:
+    """How long to show the typing indicator before sending a reply part."""
+    return min(
+        max(len(reply_part) * TYPING_MS_PER_CHAR, MIN_TYPING_MS),
+        MAX_TYPING_MS
+    )
+
+
 async def get_graph_app():
     """Get or create the compiled graph app."""
     global _graph_app, _checkpointer
@@ -39,142 +64,344 @@ async def get_graph_app():
     return _graph_app
 
 
-async def process_chat_task(chat_id: str) -> None:
+async def show_typing(chat_id: str, typing_duration: int) -> None:
     """
-    Process a chat with debounce logic.
-
-    1. Acquire advisory lock for chat_id
-    2. Wait until no new messages for DEBOUNCE_SECONDS
-    3. Fetch all unprocessed messages (user + operator)
-    4. Inject operator messages as AIMessage into LangGraph state
-    5. If last message is from user, run AI agent and send reply
-    6. If last message is from operator, skip AI (operator is handling it)
+    Pulse the typing indicator for typing_duration ms. Failures are logged, not raised.
+    Pulses go through the outbound scheduler and are dropped if they can't go out
+    within one pulse interval, so presence never delays other chats' replies.
     """
-    logger.info(f"Starting chat processing for {chat_id}")
-
     try:
-        async with advisory_lock(chat_id):
-            # Debounce loop - wait for typing to stop
-            while True:
-                last_message_time = await get_last_message_time(chat_id)
-                if last_message_time is None:
-                    logger.warning(f"No messages found for {chat_id}")
-                    return
+        start_time = datetime.now(timezone.utc)
+
+        while (datetime.now(timezone.utc) - start_time).total_seconds() * 1000 < typing_duration:
+            # Refresh typing indicator (ask for 5s display)
+            await outbound_scheduler.set_typing(chat_id, duration=5000, expires_in=TYPING_PULSE_MS / 1000)
+
+            # Wait for a "pulse" interval (e.g. 2.5s) or whatever is left
+            elapsed_ms = (datetime.now(timezone.utc) - start_time).total_seconds() * 1000
+            remaining = typing_duration - elapsed_ms
+            sleep_time = min(TYPING_PULSE_MS, remaining)
+
+            if sleep_time > 0:
+                await asyncio.sleep(sleep_time / 1000)
+    except Exception as e:
+        log_event(logger, "reply.typing_failed", level=logging.WARNING, chat_id=chat_id, error=e)
 
-                now = datetime.now(timezone.utc)
-                elapsed = (now - last_message_time).total_seconds()
-                remaining = settings.debounce_seconds - elapsed
 
-                if remaining <= 0:
-                    break
+async def deliver_reply_plan(
+    chat_id: str,
+    plan_id: int,
+    inbound_ids: list[int],
+    parts: list[tuple[int, str, bool]],
+) -> None:
+    """
+    Send the undelivered parts of a stored reply plan, in order.
 
-                logger.debug(f"Waiting {remaining:.1f}s for debounce on {chat_id}")
-                await asyncio.sleep(remaining)
+    Each part is recorded as attempted before sending and as delivered (with
+    the Evolution message ID) right after, so a retry skips parts that went
+    out. A send failure re-raises and leaves the plan pending. Once all parts
+    are delivered, the plan is completed, its inbound messages marked processed
+    and the chat's stats rollup updated.
+    """
+    pending = [(idx, text) for idx, text, delivered in parts if not delivered]
+
+    for i, (idx, reply_part) in enumerate(pending):
+        # Calculate typing duration for this part
+        typing_duration = typing_duration_ms(reply_part)
+
+        # Show typing indicator dynamically
+        log_event(
+            logger,
+            "reply.typing",
+            chat_id=chat_id,
+            part=idx + 1,
+            parts=len(parts),
+            duration_ms=typing_duration,
+            chars=len(reply_part),
+        )
+        await show_typing(chat_id, typing_duration)
+
+        # Send reply part
+        try:
+            await mark_reply_part_attempted(plan_id, idx)
+            response = await outbound_scheduler.send_text(chat_id, reply_part)
+            evolution_message_id = (response.get("key") or {}).get("id") if isinstance(response, dict) else None
+            await mark_reply_part_delivered(plan_id, idx, chat_id, reply_part, evolution_message_id)
+            log_event(logger, "reply.part_sent", chat_id=chat_id, part=idx + 1, text=MessageText(reply_part))
+        except Exception as e:
+            log_event(logger, "reply.send_failed", level=logging.ERROR, chat_id=chat_id, part=idx + 1, error=e)
+            raise
+
+        # Human pause between messages (if not the last one)
+        if i < len(pending) - 1:
+            pause_ms = random.uniform(500, 1500)
+            log_event(logger, "reply.pause", chat_id=chat_id, pause_ms=round(pause_ms))
+            await asyncio.sleep(pause_ms / 1000)
+
+    # Mark plan complete and its messages as processed
+    answered = await complete_reply_plan(plan_id, inbound_ids)
+    await record_batch(chat_id, answered, reply_parts=len(parts))
+
+
+async def reconcile_attempted_parts(
+    chat_id: str,
+    plan_id: int,
+    created_at: datetime,
+    parts: list[tuple[int, str, bool, bool]],
+) -> list[tuple[int, str, bool]]:
+    """
+    Check parts that were attempted but not recorded as delivered with Evolution.
 
-            # Fetch all unprocessed messages (now includes is_from_me)
-            messages = await fetch_unprocessed_messages(chat_id)
-            if not messages:
-                logger.info(f"No unprocessed messages for {chat_id}")
-                return
+    Such a part may have gone out: the request timed out after Evolution sent
+    it, or recording the delivery failed. A part found among the chat's sent
+    messages since the plan was created is marked delivered instead of being
+    sent twice. Lookup failures raise. Returns parts as (idx, text, delivered).
+    """
+    reconciled = [(idx, text, delivered) for idx, text, delivered, _ in parts]
+    uncertain = [i for i, (_, _, delivered, attempted) in enumerate(parts) if attempted and not delivered]
+    if not uncertain:
+        return reconciled
+
+    cutoff = created_at.timestamp() - SENT_LOOKUP_SLACK_SECONDS
+    sent = [
+        message
+        for message in map(normalize_message_data, await evolution_client.find_messages(chat_id, from_me=True))
+        if message is not None and message.timestamp >= cutoff
+    ]
+    for i in uncertain:
+        idx, text, _ = reconciled[i]
+        match = next((message for message in sent if message.text == text.strip()), None)
+        if match is None:
+            continue
+        sent.remove(match)
+        await mark_reply_part_delivered(plan_id, idx, chat_id, text, match.message_id or None)
+        log_event(logger, "reply.part_already_sent", chat_id=chat_id, plan_id=plan_id, part=idx + 1)
+        reconciled[i] = (idx, text, True)
+    return reconciled
+
+
+async def resume_reply_plan(
+    chat_id: str,
+    plan_id: int,
+    inbound_ids: list[int],
+    created_at: datetime,
+    attempts: int,
+    parts: list[tuple[int, str, bool, bool]],
+) -> None:
+    """
+    Finish a reply plan that a previous run failed to fully send, or abandon it.
 
-            # Separate messages: (id, text, received_at, is_from_me)
-            message_ids = [m[0] for m in messages]
-            last_is_from_me = messages[-1][3]  # Check if last message is from operator
+    Parts whose send may have gone through are checked with Evolution first
+    (reconcile_attempted_parts), so a resume never sends a bubble twice.
+
+    A plan is abandoned once a part has been attempted REPLY_PLAN_MAX_ATTEMPTS
+    times (including a failure now) or it is older than REPLY_PLAN_MAX_AGE_SECONDS,
+    when the reply would arrive stale. Abandoning marks the plan failed and its
+    inbound messages processed, so the caller goes on to the current batch.
+    Failures below the limits re-raise and leave the plan for the next run.
+    """
+    age = (datetime.now(timezone.utc) - created_at).total_seconds()
+    if age > settings.reply_plan_max_age_seconds:
+        reason = "too_old"
+    elif attempts >= settings.reply_plan_max_attempts:
+        reason = "max_attempts"
+    else:
+        log_event(logger, "chat.plan_resumed", chat_id=chat_id, plan_id=plan_id, attempts=attempts)
+        try:
+            parts = await reconcile_attempted_parts(chat_id, plan_id, created_at, parts)
+            await deliver_reply_plan(chat_id, plan_id, inbound_ids, parts)
+            return
+        except Exception:
+            if attempts + 1 < settings.reply_plan_max_attempts:
+                raise
+        reason = "max_attempts"
+
+    log_event(
+        logger,
+        "chat.plan_abandoned",
+        level=logging.ERROR,
+        chat_id=chat_id,
+        plan_id=plan_id,
+        reason=reason,
+        attempts=attempts,
+        age_seconds=round(age),
+        delivered_parts=sum(1 for part in parts if part[2]),
+        parts=len(parts),
+    )
+    abandoned = await abandon_reply_plan(plan_id, inbound_ids)
+    await record_batch(chat_id, abandoned)
 
-            logger.info(f"Processing {len(messages)} messages for {chat_id}, last_is_from_me={last_is_from_me}")
 
-            # Setup LangGraph
-            graph_app = await get_graph_app()
-            thread_id = f"wa:{chat_id}"
-            config = {"configurable": {"thread_id": thread_id}}
+async def process_chat_task(chat_id: str) -> None:
+    """
+    Process a chat with debounce logic.
 
-            # Separate operator and user messages
-            operator_texts = [m[1] for m in messages if m[3]]  # is_from_me = True
-            user_texts = [m[1] for m in messages if not m[3]]  # is_from_me = False
+    1. Acquire advisory lock for chat_id
+    2. Wait until no new messages for the quiet period (DEBOUNCE_SECONDS,
+       or learned per chat when adaptive debounce is enabled). In speculative
+       mode a reply is generated meanwhile and restarted if a message arrives
+    3. Fetch all unprocessed messages (user + operator)
+    4. Apply the ordered batch to LangGraph state in one checkpoint write
+       (operator messages as AIMessage, user messages as HumanMessage)
+    5. If last message is from user, the agent replies; the reply is stored
+       as a plan and its parts sent (a failed plan is resumed on the next run,
+       or abandoned once it has failed too often or grown stale)
+    6. If last message is from operator, skip AI (operator is handling it)
+    """
+    log_event(logger, "chat.started", chat_id=chat_id)
+
+    speculator = None
+    with load_monitor.track():
+        try:
+            async with advisory_lock(chat_id):
+                # Finish a reply that a previous run generated but failed to fully send
+                pending_plan = await get_pending_reply_plan(chat_id)
+                if pending_plan is not None:
+                    await resume_reply_plan(chat_id, *pending_plan)
+
+                cadence = await load_cadence(chat_id) if settings.adaptive_debounce_enabled else None
+
+                # Setup LangGraph
+                graph_app = await get_graph_app()
+                thread_id = f"wa:{chat_id}"
+                config = {"configurable": {"thread_id": thread_id}}
+
+                if settings.speculative_enabled:
+                    speculator = Speculator(graph_app, config, chat_id)
+
+                # Debounce loop - wait for typing to stop
+                while True:
+                    last_message = await get_last_message(chat_id)
+                    if last_message is None:
+                        log_event(logger, "chat.no_messages", level=logging.WARNING, chat_id=chat_id)
+                        return
+
+                    last_message_time, last_text, last_from_me = last_message
+                    if cadence is not None:
+                        quiet_period = cadence.quiet_period(last_text, last_from_me)
+                    else:
+                        quiet_period = settings.debounce_seconds
+
+                    now = datetime.now(timezone.utc)
+                    elapsed = (now - last_message_time).total_seconds()
+                    remaining = quiet_period - elapsed
+
+                    if speculator is not None:
+                        speculator.observe(last_message_time)
+
+                    if remaining <= 0:
+                        break
+
+                    sleep_for = remaining
+                    if speculator is not None:
+                        await speculator.maybe_start(last_message_time, last_from_me, elapsed)
+                        if speculator.active:
+                            # Poll so a new message cancels the speculative call promptly
+                            sleep_for = min(remaining, settings.speculative_poll_seconds)
+                        elif not last_from_me and elapsed < settings.speculative_start_seconds:
+                            # Wake up when it's time to start speculating
+                            sleep_for = min(remaining, settings.speculative_start_seconds - elapsed)
+
+                    log_event(
+                        logger,
+                        "debounce.wait",
+                        level=logging.DEBUG,
+                        chat_id=chat_id,
+                        remaining_seconds=round(remaining, 1),
+                        quiet_period_seconds=round(quiet_period, 1),
+                    )
+                    await asyncio.sleep(sleep_for)
+
+                # Fetch all unprocessed messages (now includes is_from_me)
+                messages = await fetch_unprocessed_messages(chat_id)
+                if not messages:
+                    log_event(logger, "chat.no_unprocessed", chat_id=chat_id)
+                    return
 
-            # Inject operator messages as AIMessage (they speak as the assistant)
-            if operator_texts:
-                combined_operator = "\n".join(operator_texts)
-                logger.info(f"Injecting operator message(s) into state: {combined_operator[:50]}...")
-                await graph_app.aupdate_state(
-                    config,
-                    {"messages": [AIMessage(content=combined_operator)]},
+                # Learn this sender's typing cadence from the batch
+                if cadence is not None:
+                    cadence.record(messages)
+                    await save_cadence(chat_id, cadence)
+
+                # Separate messages: (id, text, received_at, is_from_me)
+                message_ids = [m[0] for m in messages]
+                last_is_from_me = messages[-1][3]  # Check if last message is from operator
+
+                log_event(
+                    logger,
+                    "chat.batch",
+                    chat_id=chat_id,
+                    messages=len(messages),
+                    last_is_from_me=last_is_from_me,
                 )
 
-            # If last message is from operator, skip AI generation
-            if last_is_from_me:
-                logger.info(f"Last message is from operator - skipping AI generation for {chat_id}")
-                await mark_messages_processed(message_ids)
-                return
-
-            # User messages exist and last is from user - run AI
-            if not user_texts:
-                logger.info(f"No user messages to process for {chat_id}")
-                await mark_messages_processed(message_ids)
-                return
-
-            combined_user = "\n".join(user_texts)
-            logger.info(f"Running AI agent for {chat_id} with user input: {combined_user[:50]}...")
-
-            result = await graph_app.ainvoke(
-                {
-                    "user_id": chat_id,
-                    "messages": [HumanMessage(content=combined_user)],
-                },
-                config=config,
-            )
-
-            # Extract reply
-            full_response = result["messages"][-1].content
-
-            # Split messages by delimiter
-            messages_to_send = [m.strip() for m in full_response.split("|||") if m.strip()]
-
-            for i, reply_part in enumerate(messages_to_send):
-                # Calculate typing duration for this part
-                typing_duration = min(
-                    max(len(reply_part) * TYPING_MS_PER_CHAR, MIN_TYPING_MS),
-                    MAX_TYPING_MS
+                # A speculative reply generated for exactly this batch is committed
+                # as if the agent node produced it (one checkpoint write, no LLM call)
+                speculative_reply = await speculator.take(messages) if speculator is not None else None
+
+                if speculative_reply is not None:
+                    log_event(logger, "chat.speculative_commit", chat_id=chat_id)
+                    await graph_app.aupdate_state(
+                        config,
+                        {
+                            "user_id": chat_id,
+                            "messages": [*batch_to_messages(messages), speculative_reply],
+                        },
+                        as_node="agent",
+                    )
+                    full_response = speculative_reply.content
+                else:
+                    # Apply the whole ordered batch (operator + user) in one graph run.
+                    # The graph skips the agent when the last message is from the operator,
+                    # and durability="exit" persists batch + reply as a single checkpoint.
+                    log_event(
+                        logger,
+                        "chat.graph_run",
+                        chat_id=chat_id,
+                        messages=len(messages),
+                        text=MessageText(messages[-1][1]),
+                    )
+
+                    result = await graph_app.ainvoke(
+                        {
+                            "user_id": chat_id,
+                            "messages": batch_to_messages(messages),
+                        },
+                        config=config,
+                        durability="exit",
+                    )
+
+                    # If last message is from operator, the graph recorded it without generating
+                    if last_is_from_me:
+                        log_event(logger, "chat.operator_last", chat_id=chat_id)
+                        await mark_messages_processed(message_ids)
+                        await record_batch(chat_id, [(m[2], m[3]) for m in messages])
+                        if cadence is not None:
+                            cadence.answered(datetime.now(timezone.utc))
+                            await save_cadence(chat_id, cadence)
+                        return
+
+                    # Extract reply
+                    full_response = result["messages"][-1].content
+
+                # Persist the reply and its parts before sending, so a failed send
+                # resumes from the first undelivered part instead of regenerating
+                reply_parts = split_reply(full_response)
+                plan_id = await create_reply_plan(chat_id, message_ids, full_response, reply_parts)
+                await deliver_reply_plan(
+                    chat_id,
+                    plan_id,
+                    message_ids,
+                    [(idx, text, False) for idx, text in enumerate(reply_parts)],
                 )
-
-                # Show typing indicator dynamically
-                try:
-                    # Pulse loop for typing indicator
-                    logger.info(f"Typing part {i+1}/{len(messages_to_send)} for {typing_duration}ms based on {len(reply_part)} chars (pulsing)")
-                    start_time = datetime.now(timezone.utc)
-
-                    while (datetime.now(timezone.utc) - start_time).total_seconds() * 1000 < typing_duration:
-                        # Refresh typing indicator (ask for 5s display)
-                        await evolution_client.set_typing(chat_id, duration=5000)
-
-                        # Wait for a "pulse" interval (e.g. 2.5s) or whatever is left
-                        elapsed_ms = (datetime.now(timezone.utc) - start_time).total_seconds() * 1000
-                        remaining = typing_duration - elapsed_ms
-                        sleep_time = min(2500, remaining)
-
-                        if sleep_time > 0:
-                            await asyncio.sleep(sleep_time / 1000)
-                except Exception as e:
-                    logger.warning(f"Failed to set typing indicator: {e}")
-
-                # Send reply part
-                try:
-                    await evolution_client.send_text(chat_id, reply_part)
-                    await insert_outbound_message(chat_id, reply_part)
-                    logger.info(f"Sent reply part {i+1} to {chat_id}: {reply_part[:50]}...")
-                except Exception as e:
-                    logger.error(f"Failed to send reply to {chat_id}: {e}")
-                    raise
-
-                # Human pause between messages (if not the last one)
-                if i < len(messages_to_send) - 1:
-                    pause_ms = random.uniform(500, 1500)
-                    logger.info(f"Human pause for {pause_ms:.0f}ms")
-                    await asyncio.sleep(pause_ms / 1000)
-
-            # Mark messages as processed
-            await mark_messages_processed(message_ids)
-
-    except Exception as e:
-        logger.exception(f"Error processing chat {chat_id}: {e}")
-        raise
+                # Messages that arrived before this point continued the batch just answered
+                if cadence is not None:
+                    cadence.answered(datetime.now(timezone.utc))
+                    await save_cadence(chat_id, cadence)
+
+        except Exception:
+            log_event(logger, "chat.failed", level=logging.ERROR, exc_info=True, chat_id=chat_id)
+            raise
+        finally:
+            if speculator is not None:
+                speculator.cancel()
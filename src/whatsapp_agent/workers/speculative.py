@@ -0,0 +1,120 @@
+"""Speculative reply generation during the debounce window."""
+
+import asyncio
+import logging
+from datetime import datetime
+
+from langchain_core.messages import AIMessage
+
+from whatsapp_agent.settings import settings
+from whatsapp_agent.db import fetch_unprocessed_messages
+from whatsapp_agent.graphs.whatsapp_bot.graph import batch_to_messages, generate_reply
+
+logger = logging.getLogger(__name__)
+
+
+class SpeculationStats:
+    """Process-wide counters for speculative generation."""
+
+    def __init__(self):
+        self.started = 0
+        self.hits = 0          # speculative reply committed
+        self.cancelled = 0     # new message arrived while generating
+        self.discarded = 0     # finished (or failed) but batch changed / unusable
+
+    def snapshot(self) -> dict:
+        wasted = self.cancelled + self.discarded
+        return {
+            "started": self.started,
+            "hits": self.hits,
+            "cancelled": self.cancelled,
+            "discarded": self.discarded,
+            "hit_rate": round(self.hits / self.started, 3) if self.started else None,
+            "waste_rate": round(wasted / self.started, 3) if self.started else None,
+        }
+
+
+speculation_stats = SpeculationStats()
+
+
+def _drop(task: asyncio.Task) -> None:
+    """Cancel a generation task without leaving an unretrieved exception behind."""
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+class Speculator:
+    """
+    Generates a reply for the messages received so far while the debounce
+    window is still open.
+
+    The reply is only held in memory: nothing is checkpointed or sent until
+    the worker calls take() after the quiet period, and it is only returned
+    if the batch is exactly the one it was generated for.
+    """
+
+    def __init__(self, graph_app, config: dict, chat_id: str):
+        self.graph_app = graph_app
+        self.config = config
+        self.chat_id = chat_id
+        self.task: asyncio.Task | None = None
+        self.batch_ids: list[int] = []
+        self.last_message_time: datetime | None = None
+
+    @property
+    def active(self) -> bool:
+        return self.task is not None
+
+    def observe(self, last_message_time: datetime) -> None:
+        """Cancel the in-flight generation if a newer message has arrived."""
+        if self.task is not None and last_message_time != self.last_message_time:
+            logger.info(f"New message for {self.chat_id}, cancelling speculative reply")
+            _drop(self.task)
+            self.task = None
+            speculation_stats.cancelled += 1
+
+    async def maybe_start(self, last_message_time: datetime, last_from_me: bool, elapsed: float) -> None:
+        """Start generating once the user has paused for speculative_start_seconds."""
+        if self.task is not None or last_from_me or elapsed < settings.speculative_start_seconds:
+            return
+        batch = await fetch_unprocessed_messages(self.chat_id)
+        if not batch or batch[-1][3]:
+            return
+        self.batch_ids = [m[0] for m in batch]
+        self.last_message_time = last_message_time
+        self.task = asyncio.create_task(self._generate(batch))
+        speculation_stats.started += 1
+        logger.info(f"Speculatively generating reply for {self.chat_id} on {len(batch)} message(s)")
+
+    async def _generate(self, batch: list) -> AIMessage:
+        state = await self.graph_app.aget_state(self.config)
+        history = state.values.get("messages", [])
+        return await generate_reply([*history, *batch_to_messages(batch)])
+
+    async def take(self, batch: list) -> AIMessage | None:
+        """
+        Return the speculative reply if it was generated for exactly this batch.
+        Otherwise (or if it failed) discard it and return None.
+        """
+        if self.task is None:
+            return None
+        task, self.task = self.task, None
+        if [m[0] for m in batch] != self.batch_ids:
+            _drop(task)
+            speculation_stats.discarded += 1
+            return None
+        try:
+            reply = await task
+        except Exception as e:
+            logger.warning(f"Speculative reply failed for {self.chat_id}: {e}")
+            speculation_stats.discarded += 1
+            return None
+        speculation_stats.hits += 1
+        return reply
+
+    def cancel(self) -> None:
+        """Drop any in-flight generation (worker exiting early)."""
+        if self.task is not None:
+            _drop(self.task)
+            self.task = None
+            speculation_stats.discarded += 1
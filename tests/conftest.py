@@ -0,0 +1,13 @@
+"""Shared test setup."""
+
+import os
+
+# Settings are loaded at import time; unit tests don't need real credentials
+for _key, _value in {
+    "DATABASE_URL": "postgresql://localhost/whatsapp_agent_test",
+    "OPENROUTER_API_KEY": "test",
+    "EVOLUTION_API_URL": "http://localhost",
+    "EVOLUTION_API_KEY": "test",
+    "EVOLUTION_INSTANCE": "test",
+}.items():
+    os.environ.setdefault(_key, _value)
@@ -0,0 +1,250 @@
+"""CachedCheckpointSaver coherence, eviction and byte accounting against InMemorySaver."""
+
+import operator
+from typing import Annotated, TypedDict
+
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+
+from whatsapp_agent.graphs.whatsapp_bot import checkpoint_cache
+from whatsapp_agent.graphs.whatsapp_bot.checkpoint_cache import CachedCheckpointSaver, _estimate_size
+
+
+class RecordingSaver(InMemorySaver):
+    """InMemorySaver with the maintenance methods it lacks, recording calls."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def adelete_for_runs(self, run_ids):
+        self.calls.append(("delete_for_runs", list(run_ids)))
+
+    async def acopy_thread(self, source_thread_id, target_thread_id):
+        self.calls.append(("copy_thread", source_thread_id, target_thread_id))
+
+    async def aprune(self, thread_ids, *, strategy="keep_latest"):
+        self.calls.append(("prune", list(thread_ids), strategy))
+
+
+def _config(thread_id: str, checkpoint_id: str | None = None) -> dict:
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+def _checkpoint(text: str, version: int = 1) -> dict:
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"text": text}
+    checkpoint["channel_versions"] = {"text": version}
+    return checkpoint
+
+
+async def _put(saver, thread_id: str, text: str, version: int = 1, parent: dict | None = None) -> dict:
+    return await saver.aput(
+        parent or _config(thread_id),
+        _checkpoint(text, version),
+        {"source": "update", "step": version, "parents": {}},
+        {"text": version},
+    )
+
+
+@pytest.fixture
+def inner():
+    return RecordingSaver()
+
+
+@pytest.fixture(autouse=True)
+def latest_from_inner(monkeypatch, inner):
+    """The version check reads the latest checkpoint ID straight from the wrapped saver."""
+    async def get_latest_checkpoint_id(thread_id, checkpoint_ns=""):
+        latest = await inner.aget_tuple(_config(thread_id))
+        return latest.checkpoint["id"] if latest else None
+
+    monkeypatch.setattr(checkpoint_cache, "get_latest_checkpoint_id", get_latest_checkpoint_id)
+
+
+def _cache(inner, max_bytes=1_000_000, idle_seconds=3600):
+    return CachedCheckpointSaver(inner, max_bytes=max_bytes, idle_seconds=idle_seconds)
+
+
+def _entry_size(text: str) -> int:
+    return _estimate_size({"text": text})
+
+
+async def test_write_through_then_hit(inner):
+    cache = _cache(inner)
+    config = await _put(cache, "t1", "hello")
+
+    assert (await inner.aget_tuple(_config("t1"))).checkpoint["id"] == config["configurable"]["checkpoint_id"]
+    loaded = await cache.aget_tuple(_config("t1"))
+    assert loaded.checkpoint["channel_values"] == {"text": "hello"}
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 0
+
+
+async def test_write_by_another_process_is_detected(inner):
+    cache = _cache(inner)
+    first = await _put(cache, "t1", "from us")
+    # Another process appends a checkpoint directly in the database
+    await _put(inner, "t1", "from elsewhere", version=2, parent=first)
+
+    loaded = await cache.aget_tuple(_config("t1"))
+    assert loaded.checkpoint["channel_values"] == {"text": "from elsewhere"}
+    assert cache.stats()["misses"] == 1
+    # The reloaded copy is cached and served on the next read
+    await cache.aget_tuple(_config("t1"))
+    assert cache.stats()["hits"] == 1
+
+
+async def test_specific_checkpoint_id_bypasses_cache(inner):
+    cache = _cache(inner)
+    first = await _put(cache, "t1", "one")
+    await _put(cache, "t1", "two", version=2, parent=first)
+
+    loaded = await cache.aget_tuple(first)
+    assert loaded.checkpoint["channel_values"] == {"text": "one"}
+    assert cache.stats()["hits"] == 0 and cache.stats()["misses"] == 0
+
+
+async def test_put_writes_drops_cached_checkpoint(inner):
+    cache = _cache(inner)
+    config = await _put(cache, "t1", "hello")
+    assert cache.stats()["entries"] == 1
+
+    await cache.aput_writes(config, [("text", "pending")], task_id="task-1")
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+
+    loaded = await cache.aget_tuple(_config("t1"))
+    assert [write[1:] for write in loaded.pending_writes] == [("text", "pending")]
+
+
+async def test_put_writes_for_older_checkpoint_keeps_entry(inner):
+    cache = _cache(inner)
+    first = await _put(cache, "t1", "one")
+    await _put(cache, "t1", "two", version=2, parent=first)
+
+    await cache.aput_writes(first, [("text", "late")], task_id="task-1")
+    assert cache.stats()["entries"] == 1
+
+
+async def test_failed_put_drops_entry(inner, monkeypatch):
+    cache = _cache(inner)
+    config = await _put(cache, "t1", "hello")
+
+    async def failing_aput(*args, **kwargs):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(inner, "aput", failing_aput)
+    with pytest.raises(RuntimeError):
+        await _put(cache, "t1", "lost", version=2, parent=config)
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+
+
+async def test_byte_accounting_on_replace(inner):
+    cache = _cache(inner)
+    config = await _put(cache, "t1", "short")
+    await _put(cache, "t1", "a much longer value than before", version=2, parent=config)
+
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] == _entry_size("a much longer value than before")
+
+
+async def test_lru_eviction_by_bytes(inner):
+    size = _entry_size("x" * 100)
+    cache = _cache(inner, max_bytes=2 * size)
+    await _put(cache, "a", "x" * 100)
+    await _put(cache, "b", "x" * 100)
+    await cache.aget_tuple(_config("a"))  # "a" becomes most recently used
+
+    await _put(cache, "c", "x" * 100)
+    assert {key[0] for key in cache._entries} == {"a", "c"}
+    assert cache.stats()["bytes"] == 2 * size
+
+
+async def test_oversized_entry_not_cached(inner):
+    cache = _cache(inner, max_bytes=_entry_size("x" * 10))
+    await _put(cache, "t1", "x" * 1000)
+
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+    assert (await cache.aget_tuple(_config("t1"))).checkpoint["channel_values"] == {"text": "x" * 1000}
+
+
+async def test_idle_eviction(inner, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(checkpoint_cache.time, "monotonic", lambda: now[0])
+    cache = _cache(inner, idle_seconds=60)
+    await _put(cache, "old", "stale soon")
+
+    now[0] += 30
+    await _put(cache, "new", "fresh")
+    now[0] += 40  # "old" idle for 70s, "new" for 40s
+
+    assert await cache.aget_tuple(_config("old")) is not None
+    assert cache.stats()["misses"] == 1  # expired entry reloaded, not served
+    now[0] += 61
+    await _put(cache, "other", "value")  # storing evicts idle entries
+    assert {key[0] for key in cache._entries} == {"other"}
+    assert cache.stats()["bytes"] == _entry_size("value")
+
+
+async def test_maintenance_methods_invalidate_then_delegate(inner):
+    cache = _cache(inner)
+    for thread_id in ("a", "b", "c"):
+        await _put(cache, thread_id, thread_id)
+
+    await cache.acopy_thread("a", "b")
+    assert {key[0] for key in cache._entries} == {"a", "c"}
+    await cache.aprune(["c"])
+    assert {key[0] for key in cache._entries} == {"a"}
+    await cache.adelete_for_runs(["run-1"])
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+    assert inner.calls == [
+        ("copy_thread", "a", "b"),
+        ("prune", ["c"], "keep_latest"),
+        ("delete_for_runs", ["run-1"]),
+    ]
+
+    await _put(cache, "a", "again")
+    await cache.adelete_thread("a")
+    assert cache.stats()["entries"] == 0
+    assert await inner.aget_tuple(_config("a")) is None
+
+
+def test_with_allowlist_wraps_derived_saver(inner, monkeypatch):
+    cache = _cache(inner)
+    monkeypatch.setattr(inner, "with_allowlist", lambda allowlist: inner)
+    assert cache.with_allowlist({("my_module", "MyType")}) is cache
+
+    derived_inner = RecordingSaver()
+    monkeypatch.setattr(inner, "with_allowlist", lambda allowlist: derived_inner)
+    derived = cache.with_allowlist({("my_module", "MyType")})
+    assert isinstance(derived, CachedCheckpointSaver)
+    assert derived.saver is derived_inner and derived._entries is not cache._entries
+
+
+class CountState(TypedDict):
+    items: Annotated[list[str], operator.add]
+
+
+async def test_multi_turn_graph_with_exit_durability(inner):
+    def reply(state: CountState) -> dict:
+        return {"items": [f"reply {len(state['items'])}"]}
+
+    builder = StateGraph(CountState)
+    builder.add_node("reply", reply)
+    builder.add_edge(START, "reply")
+    builder.add_edge("reply", END)
+    cache = _cache(inner)
+    app = builder.compile(checkpointer=cache)
+    config = {"configurable": {"thread_id": "chat"}}
+
+    for turn in range(5):
+        result = await app.ainvoke({"items": [f"user {turn}"]}, config, durability="exit")
+        assert len(result["items"]) == 2 * (turn + 1)
+
+    assert result["items"][-2:] == ["user 4", "reply 9"]
+    assert (await inner.aget_tuple(_config("chat"))).checkpoint["channel_values"]["items"] == result["items"]
+    assert cache.stats()["misses"] == 1 and cache.stats()["hits"] == 4
@@ -0,0 +1,126 @@
+"""Adaptive debounce: what ChatCadence learns from batches and the quiet period it picks."""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from whatsapp_agent.settings import settings
+from whatsapp_agent.workers.debounce import ChatCadence
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def adaptive_settings(monkeypatch):
+    monkeypatch.setattr(settings, "debounce_seconds", 10)
+    monkeypatch.setattr(settings, "debounce_floor_seconds", 2.0)
+    monkeypatch.setattr(settings, "debounce_ceiling_seconds", 15.0)
+    monkeypatch.setattr(settings, "debounce_percentile", 0.9)
+    monkeypatch.setattr(settings, "debounce_min_samples", 8)
+
+
+def _batch(offsets: list[float]) -> list[tuple[int, str, datetime, bool]]:
+    return [(i, "ok", _at(offset), False) for i, offset in enumerate(offsets)]
+
+
+def _at(offset: float) -> datetime:
+    return START + timedelta(seconds=offset)
+
+
+def _converse(cadence: ChatCadence, offsets: list[float], answer_seconds: float = 6.0) -> tuple[float, int]:
+    """
+    Feed user messages (seconds since START) through the debounce as the worker does:
+    a batch closes once the quiet period passes with no new message (not before the
+    previous batch was answered, the worker waits for the chat lock) and is answered
+    answer_seconds later. Returns the learned quiet period and the number of batches.
+    """
+    batch = [offsets[0]]
+    answered_at = float("-inf")
+    batches = 0
+
+    def close() -> None:
+        nonlocal answered_at, batches
+        closed_at = max(batch[-1] + cadence.quiet_period("ok", False), answered_at)
+        cadence.record(_batch(batch))
+        answered_at = closed_at + answer_seconds
+        cadence.answered(_at(answered_at))
+        batches += 1
+
+    for offset in offsets[1:]:
+        if offset > max(batch[-1] + cadence.quiet_period("ok", False), answered_at):
+            close()
+            batch = []
+        batch.append(offset)
+    close()
+    return cadence.quiet_period("ok", False), batches
+
+
+def test_single_message_sender_keeps_default():
+    """One message every 40s, each answered: no gap across a reply is typing cadence."""
+    cadence = ChatCadence()
+    quiet, _ = _converse(cadence, [40.0 * i for i in range(50)])
+
+    assert cadence.sample_count == 0
+    assert quiet == settings.debounce_seconds
+
+
+def test_burst_typer_fires_at_floor():
+    """Bursts of five messages 1s apart, a minute between bursts."""
+    cadence = ChatCadence()
+    offsets = [60.0 * burst + second for burst in range(20) for second in range(5)]
+    quiet, _ = _converse(cadence, offsets)
+
+    assert cadence.sample_count == 20 * 4
+    assert quiet == settings.debounce_floor_seconds
+
+
+def test_slow_typer_estimate_does_not_collapse():
+    """Gaps of 4-12s: gaps longer than the quiet period split a burst, and must still be learned."""
+    rng = random.Random(7)
+    offsets = []
+    start = 0.0
+    for _ in range(40):
+        gaps = [rng.uniform(4.0, 12.0) for _ in range(5)]
+        offsets += [start + sum(gaps[:i]) for i in range(6)]
+        start = offsets[-1] + 120.0
+    all_gaps = sorted(b - a for a, b in zip(offsets, offsets[1:]) if b - a < 60)
+    real_p90 = all_gaps[int(0.9 * len(all_gaps))]
+
+    cadence = ChatCadence()
+    quiet, batches = _converse(cadence, offsets)
+
+    assert quiet >= real_p90
+    # About the 10% of gaps above the 90th percentile split a burst (a fixed 10s splits 25%)
+    splits = batches - 40
+    assert splits <= 0.1 * len(all_gaps)
+
+
+def test_gap_across_an_answer_is_not_cadence():
+    cadence = ChatCadence()
+    cadence.record(_batch([0.0, 2.0]))
+    cadence.answered(_at(20.0))
+    # Arrived after the reply: a new turn
+    cadence.record(_batch([25.0]))
+    assert cadence.sample_count == 1
+
+    cadence.answered(_at(40.0))
+    # Arrived while the previous batch was being answered: the same burst
+    cadence.record(_batch([37.0, 38.0]))
+    assert cadence.sample_count == 3
+
+
+def test_record_skips_operator_messages_and_unanswered_batches_do_not_carry():
+    cadence = ChatCadence()
+    batch = _batch([0.0, 3.0])
+    batch.insert(1, (9, "operator", START + timedelta(seconds=1), True))
+    cadence.record(batch)
+    cadence.record(_batch([30.0]))
+
+    assert cadence.sample_count == 1
+
+
+def test_question_fires_after_floor():
+    cadence = ChatCadence()
+    assert cadence.quiet_period("are you there?", False) == settings.debounce_floor_seconds
+    assert cadence.quiet_period("are you there?", True) == settings.debounce_seconds
@@ -0,0 +1,55 @@
+"""History trimming sized by characters."""
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from whatsapp_agent.graphs.whatsapp_bot.graph import history_chars, trim_history
+from whatsapp_agent.settings import settings
+
+
+def _turns(count: int) -> list:
+    return [
+        message
+        for i in range(count)
+        for message in (
+            HumanMessage(content=f"question {i} about the delivery schedule", id=f"h{i}"),
+            AIMessage(content=f"answer {i}, it arrives on thursday", id=f"a{i}"),
+        )
+    ]
+
+
+def test_burst_does_not_evict_earlier_turns():
+    history = _turns(8)
+    burst = [HumanMessage(content=word, id=f"b{i}") for i, word in enumerate("ok so about that one more thing".split())]
+
+    trimmed = trim_history(history + burst)
+    assert trimmed == history + burst
+
+
+def test_trims_oldest_to_budget_and_starts_on_human(monkeypatch):
+    monkeypatch.setattr(settings, "history_max_chars", 500)
+    history = _turns(50)
+
+    trimmed = trim_history(history)
+    assert history_chars(trimmed) <= 500
+    assert trimmed == history[-len(trimmed):]
+    assert isinstance(trimmed[0], HumanMessage)
+    assert history_chars(history[-len(trimmed) - 2:]) > 500
+
+
+def test_oversized_last_message_is_truncated_not_dropped():
+    trimmed = trim_history([HumanMessage(content="hi"), AIMessage(content="yo"), HumanMessage(content="x" * 7000, id="h")])
+
+    assert len(trimmed) == 1 and isinstance(trimmed[0], HumanMessage)
+    assert trimmed[0].id == "h" and trimmed[0].content.startswith("xxx")
+    assert history_chars(trimmed) <= settings.history_max_chars
+
+
+def test_oversized_batch_keeps_its_newest_messages(monkeypatch):
+    monkeypatch.setattr(settings, "history_max_chars", 300)
+    batch = [HumanMessage(content=f"{i}" * 100, id=f"b{i}") for i in range(5)]
+
+    trimmed = trim_history(_turns(3) + batch)
+    assert [m.id for m in trimmed] == ["b2", "b3", "b4"]
+    assert trimmed[1:] == batch[3:]
+    assert trimmed[0].content.startswith("2") and trimmed[0].content.endswith("[...]")
+    assert history_chars(trimmed) <= 300
@@ -0,0 +1,149 @@
+"""History import: parsing off the event loop, chunked COPY, the spool size cap and locked seeding."""
+
+import json
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from whatsapp_agent.api import routes_evolution
+from whatsapp_agent.integrations import normalize_message_data
+from whatsapp_agent.settings import settings
+from whatsapp_agent.workers import history_import
+from whatsapp_agent.workers.history_import import import_history
+
+
+def _record(i: int, chat: str = "971501234567@s.whatsapp.net") -> dict:
+    return {
+        "key": {"remoteJid": chat, "fromMe": i % 2 == 1, "id": f"MSG{i}"},
+        "message": {"conversation": f"message {i}"},
+        "messageTimestamp": 1_700_000_000 + i,
+    }
+
+
+async def test_records_are_parsed_off_the_loop_and_copied_in_chunks(monkeypatch):
+    loop_thread = threading.get_ident()
+    parsing_threads = set()
+    copied = []
+
+    def records():
+        for i in range(12):
+            parsing_threads.add(threading.get_ident())
+            yield _record(i)
+
+    async def copy_inbound_messages(rows):
+        copied.append(len(rows))
+        return len(rows)
+
+    monkeypatch.setattr(history_import, "IMPORT_CHUNK_ROWS", 5)
+    monkeypatch.setattr(history_import, "copy_inbound_messages", copy_inbound_messages)
+    stats = await import_history(records(), seed=False)
+
+    assert loop_thread not in parsing_threads
+    assert copied == [5, 5, 2]
+    assert stats == {"records": 12, "messages": 12, "inserted": 12, "chats": 1, "seeded": 0}
+
+
+def _client(monkeypatch) -> tuple[TestClient, list]:
+    imported = []
+
+    async def import_history_file(path):
+        with open(path, "rb") as spool:
+            imported.append(spool.read())
+
+    monkeypatch.setattr(routes_evolution, "import_history_file", import_history_file)
+    app = FastAPI()
+    app.include_router(routes_evolution.router)
+    return TestClient(app), imported
+
+
+def test_history_body_is_spooled_and_imported(monkeypatch):
+    client, imported = _client(monkeypatch)
+    response = client.post("/webhooks/evolution/messages-set", content=b'{"data": []}')
+
+    assert response.json() == {"ok": True, "action": "history_import"}
+    assert imported == [b'{"data": []}']
+
+
+def test_history_body_over_limit_is_refused(monkeypatch):
+    monkeypatch.setattr(settings, "history_max_body_bytes", 16)
+    client, imported = _client(monkeypatch)
+
+    response = client.post("/webhooks/evolution/messages-set", content=b"x" * 17)
+    assert response.status_code == 413
+
+    # Without a Content-Length the stream is counted and cut off
+    response = client.post("/webhooks/evolution/messages-set", content=iter([b"x" * 10, b"x" * 10]))
+    assert response.status_code == 413
+    assert imported == []
+
+
+class FakeGraph:
+    def __init__(self, events, existing):
+        self.events = events
+        self.existing = existing
+
+    async def aget_state(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        self.events.append(("get", thread_id))
+        return SimpleNamespace(values={"messages": ["kept"]} if thread_id in self.existing else {})
+
+    async def aupdate_state(self, config, values, as_node):
+        self.events.append(("update", config["configurable"]["thread_id"], len(values["messages"])))
+
+
+async def test_seed_threads_writes_under_the_chat_lock(monkeypatch):
+    events = []
+
+    @asynccontextmanager
+    async def advisory_lock(chat_id):
+        if chat_id == "busy":
+            raise TimeoutError
+        events.append(("lock", chat_id))
+        yield
+        events.append(("unlock", chat_id))
+
+    async def get_graph_app():
+        return FakeGraph(events, existing={"wa:old"})
+
+    monkeypatch.setattr(history_import, "advisory_lock", advisory_lock)
+    monkeypatch.setattr(history_import, "get_graph_app", get_graph_app)
+    message = normalize_message_data(_record(1))
+    recent = {chat: [(datetime.now(timezone.utc), 0, message)] for chat in ("new", "old", "busy")}
+
+    assert await history_import.seed_threads(recent) == 1
+    assert events == [
+        ("lock", "new"), ("get", "wa:new"), ("update", "wa:new", 1), ("unlock", "new"),
+        ("lock", "old"), ("get", "wa:old"), ("unlock", "old"),
+    ]
+
+
+def test_large_history_sync_on_main_webhook_is_spooled(monkeypatch):
+    monkeypatch.setattr(routes_evolution, "INLINE_BODY_BYTES", 64)
+    client, imported = _client(monkeypatch)
+    body = json.dumps({"event": "messages.set", "data": [_record(i) for i in range(5)]}).encode()
+
+    response = client.post("/webhooks/evolution", content=body)
+    assert response.json() == {"ok": True, "action": "history_import"}
+    assert imported == [body]
+
+
+def test_large_other_event_on_main_webhook_is_still_handled(monkeypatch):
+    monkeypatch.setattr(routes_evolution, "INLINE_BODY_BYTES", 64)
+    client, imported = _client(monkeypatch)
+    body = json.dumps({"event": "connection.update", "data": {"state": "open", "padding": "x" * 500}}).encode()
+
+    response = client.post("/webhooks/evolution", content=body)
+    assert response.json() == {"ok": True, "action": "ignored"}
+    assert imported == []
+
+
+def test_main_webhook_body_over_limit_is_refused(monkeypatch):
+    monkeypatch.setattr(settings, "history_max_body_bytes", 16)
+    client, _ = _client(monkeypatch)
+
+    response = client.post("/webhooks/evolution", content=iter([b"x" * 10, b"x" * 10]))
+    assert response.status_code == 413
@@ -0,0 +1,59 @@
+"""LoadMonitor: deferred chats are recovered from the database, not only from memory."""
+
+import asyncio
+
+from whatsapp_agent.workers import load
+from whatsapp_agent.workers.load import LoadMonitor
+
+
+async def test_startup_sweep_dispatches_orphaned_chats(monkeypatch):
+    sweeps = []
+
+    async def get_orphaned_chats(older_than_seconds, limit):
+        sweeps.append((older_than_seconds, limit))
+        return ["a", "b"]
+
+    monkeypatch.setattr(load, "get_orphaned_chats", get_orphaned_chats)
+    monkeypatch.setattr(load, "get_pool_wait_ms", lambda: 0.0)
+    dispatched = []
+
+    async def dispatch(chat_id):
+        dispatched.append(chat_id)
+
+    # A fresh monitor, as after a restart: nothing deferred in memory
+    monitor = LoadMonitor()
+    monitor.start(dispatch)
+    await asyncio.sleep(load.LAG_INTERVAL_SECONDS * 2.5)
+    await monitor.stop()
+
+    assert len(sweeps) == 1
+    assert dispatched == ["a", "b"]
+    assert monitor.snapshot()["deferred_chats"] == 0
+
+
+async def test_sweep_merges_with_local_hints_and_survives_db_errors(monkeypatch):
+    monitor = LoadMonitor()
+    monitor.defer("a")
+
+    async def get_orphaned_chats(older_than_seconds, limit):
+        return ["a", "b"]
+
+    monkeypatch.setattr(load, "get_orphaned_chats", get_orphaned_chats)
+    await monitor._sweep()
+    assert list(monitor.deferred) == ["a", "b"]
+
+    async def failing(older_than_seconds, limit):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(load, "get_orphaned_chats", failing)
+    await monitor._sweep()
+    assert list(monitor.deferred) == ["a", "b"]
+
+
+async def test_drain_waits_for_headroom(monkeypatch):
+    monitor = LoadMonitor()
+    monitor.defer("a")
+    monkeypatch.setattr(monitor, "load_ratio", lambda: 1.2)
+
+    monitor._drain()
+    assert list(monitor.deferred) == ["a"]
@@ -0,0 +1,162 @@
+"""OutboundScheduler: per-chat order, priorities, stale pulses and backoff on 429."""
+
+import asyncio
+import time
+from datetime import datetime
+
+import httpx
+import pytest
+
+from whatsapp_agent.integrations import outbound
+from whatsapp_agent.integrations.outbound import OutboundScheduler
+from whatsapp_agent.settings import settings
+
+
+class FakeClient:
+    """Records calls; 429s the first `throttle` sends."""
+
+    instance = "test"
+
+    def __init__(self, throttle: int = 0, retry_after: str | None = None):
+        self.calls: list[tuple[str, str, str]] = []
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.in_flight: dict[str, int] = {}
+        self.max_in_flight = 0
+
+    async def send_text(self, to: str, text: str) -> dict:
+        self.calls.append(("text", to, text))
+        self.in_flight[to] = self.in_flight.get(to, 0) + 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight[to])
+        try:
+            await asyncio.sleep(0.01 * (len(text) % 3))
+            if self.throttle:
+                self.throttle -= 1
+                request = httpx.Request("POST", "http://evolution/message/sendText/test")
+                headers = {"Retry-After": self.retry_after} if self.retry_after else {}
+                response = httpx.Response(429, headers=headers, request=request)
+                raise httpx.HTTPStatusError("throttled", request=request, response=response)
+            return {"key": {"id": text}}
+        finally:
+            self.in_flight[to] -= 1
+
+    async def set_typing(self, to: str, duration: int = 3000) -> dict:
+        self.calls.append(("typing", to, ""))
+        return {}
+
+
+@pytest.fixture(autouse=True)
+def fast_rate(monkeypatch):
+    monkeypatch.setattr(settings, "outbound_rate_per_second", 20.0)
+    monkeypatch.setattr(settings, "outbound_min_rate_per_second", 1.0)
+    monkeypatch.setattr(settings, "outbound_burst", 1)
+    monkeypatch.setattr(settings, "outbound_rate_increase", 0.0)
+    monkeypatch.setattr(settings, "outbound_rate_decrease", 0.5)
+    monkeypatch.setattr(settings, "outbound_max_attempts", 3)
+
+
+@pytest.fixture
+async def scheduler():
+    scheduler = OutboundScheduler(FakeClient(), shared=False)
+    yield scheduler
+    await scheduler.stop()
+
+
+async def test_calls_within_a_chat_keep_their_order(scheduler):
+    texts = [f"part {i}" + "!" * i for i in range(6)]
+    results = await asyncio.gather(*(scheduler.send_text("a", text) for text in texts))
+
+    assert [call[2] for call in scheduler.client.calls] == texts
+    assert [result["key"]["id"] for result in results] == texts
+    assert scheduler.client.max_in_flight == 1
+
+
+async def test_replies_go_before_presence_pulses(scheduler):
+    scheduler.tokens = 0.0
+    typing = asyncio.create_task(scheduler.set_typing("a"))
+    await asyncio.sleep(0)
+    reply = asyncio.create_task(scheduler.send_text("b", "hello"))
+    await asyncio.gather(typing, reply)
+
+    assert [call[0] for call in scheduler.client.calls] == ["text", "typing"]
+
+
+async def test_expired_pulses_are_dropped_not_sent(scheduler):
+    scheduler.tokens = 0.0
+    scheduler.rate = 2.0  # next token in 0.5s
+
+    assert await scheduler.set_typing("a", expires_in=0.1) is None
+    assert scheduler.client.calls == []
+    assert scheduler.dropped == 1
+
+
+async def test_429_pauses_for_retry_after_and_cuts_the_rate():
+    scheduler = OutboundScheduler(FakeClient(throttle=1, retry_after="0.3"), shared=False)
+    try:
+        started = time.monotonic()
+        result = await scheduler.send_text("a", "hello")
+        elapsed = time.monotonic() - started
+    finally:
+        await scheduler.stop()
+
+    assert result == {"key": {"id": "hello"}}
+    assert elapsed >= 0.3
+    assert len(scheduler.client.calls) == 2
+    assert scheduler.throttled == 1
+    assert scheduler.rate == 10.0
+
+
+async def test_429_past_max_attempts_reaches_the_caller(monkeypatch):
+    monkeypatch.setattr(settings, "outbound_max_attempts", 2)
+    scheduler = OutboundScheduler(FakeClient(throttle=5, retry_after="0"), shared=False)
+    try:
+        with pytest.raises(httpx.HTTPStatusError):
+            await scheduler.send_text("a", "hello")
+    finally:
+        await scheduler.stop()
+
+    assert len(scheduler.client.calls) == 2
+    # The retry went out at the cut rate and was throttled again: cut again
+    assert scheduler.rate == 5.0
+
+
+async def test_shared_bucket_waits_and_reports_throttling(monkeypatch):
+    takes = [(0.05, 0.2, 5.0), (0.0, 0.0, 5.0), (0.0, 0.0, 5.0)]
+    throttles = []
+
+    async def init_outbound_bucket(instance, burst, rate):
+        pass
+
+    async def take_outbound_token(instance, burst, min_rate, max_rate, rate_increase=0.0):
+        return takes.pop(0)
+
+    async def throttle_outbound_bucket(instance, retry_after_seconds, dispatched_at, rate_decrease, min_rate):
+        throttles.append((instance, retry_after_seconds, dispatched_at))
+        return (2.5, True)
+
+    monkeypatch.setattr(outbound, "init_outbound_bucket", init_outbound_bucket)
+    monkeypatch.setattr(outbound, "take_outbound_token", take_outbound_token)
+    monkeypatch.setattr(outbound, "throttle_outbound_bucket", throttle_outbound_bucket)
+    scheduler = OutboundScheduler(FakeClient(throttle=1, retry_after="0"), shared=True)
+    try:
+        assert await scheduler.send_text("a", "hello") == {"key": {"id": "hello"}}
+    finally:
+        await scheduler.stop()
+
+    assert takes == []
+    assert len(throttles) == 1
+    assert throttles[0][:2] == ("test", 0.0)
+    assert isinstance(throttles[0][2], datetime)
+    assert scheduler.rate == 5.0  # as the last shared take reported
+
+
+async def test_shared_bucket_falls_back_to_local_when_the_database_fails(monkeypatch):
+    async def init_outbound_bucket(instance, burst, rate):
+        raise OSError("database down")
+
+    monkeypatch.setattr(outbound, "init_outbound_bucket", init_outbound_bucket)
+    scheduler = OutboundScheduler(FakeClient(), shared=True)
+    try:
+        assert await scheduler.send_text("a", "hello") == {"key": {"id": "hello"}}
+    finally:
+        await scheduler.stop()
@@ -0,0 +1,123 @@
+"""Resuming stored reply plans: retries are bounded, nothing is sent twice and stale replies are never sent."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from whatsapp_agent.settings import settings
+from whatsapp_agent.workers import process_chat
+from whatsapp_agent.workers.process_chat import resume_reply_plan
+
+PARTS = [(0, "first", True, True), (1, "second", False, False)]
+
+
+class Calls(list):
+    """Records repo and delivery calls; deliveries fail while fail is set."""
+
+    fail = False
+    lookup_error: Exception | None = None
+    sent: list[dict] = []
+    delivered_parts: list | None = None
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = Calls()
+
+    async def deliver_reply_plan(chat_id, plan_id, inbound_ids, parts):
+        calls.append(("deliver", plan_id))
+        calls.delivered_parts = parts
+        if calls.fail:
+            raise RuntimeError("evolution down")
+
+    async def abandon_reply_plan(plan_id, inbound_ids):
+        calls.append(("abandon", plan_id, inbound_ids))
+        return [(datetime.now(timezone.utc), False)]
+
+    async def record_batch(chat_id, answered, reply_parts=0):
+        calls.append(("stats", len(answered), reply_parts))
+
+    async def find_messages(remote_jid, from_me=None, limit=50):
+        calls.append(("lookup", remote_jid, from_me))
+        if calls.lookup_error:
+            raise calls.lookup_error
+        return calls.sent
+
+    async def mark_reply_part_delivered(plan_id, idx, chat_id, text, evolution_message_id):
+        calls.append(("delivered", plan_id, idx, evolution_message_id))
+
+    monkeypatch.setattr(process_chat, "deliver_reply_plan", deliver_reply_plan)
+    monkeypatch.setattr(process_chat, "abandon_reply_plan", abandon_reply_plan)
+    monkeypatch.setattr(process_chat, "record_batch", record_batch)
+    monkeypatch.setattr(process_chat.evolution_client, "find_messages", find_messages)
+    monkeypatch.setattr(process_chat, "mark_reply_part_delivered", mark_reply_part_delivered)
+    monkeypatch.setattr(settings, "reply_plan_max_attempts", 3)
+    monkeypatch.setattr(settings, "reply_plan_max_age_seconds", 600.0)
+    return calls
+
+
+def _ago(seconds: float) -> datetime:
+    return datetime.now(timezone.utc) - timedelta(seconds=seconds)
+
+
+async def test_recent_plan_is_resumed(calls):
+    await resume_reply_plan("chat", 1, [10, 11], _ago(30), 1, PARTS)
+    assert calls == [("deliver", 1)]
+
+
+async def test_failure_below_limit_is_raised_for_a_later_retry(calls):
+    calls.fail = True
+    with pytest.raises(RuntimeError):
+        await resume_reply_plan("chat", 1, [10, 11], _ago(30), 1, PARTS)
+    assert calls == [("deliver", 1)]
+
+
+async def test_failure_reaching_limit_abandons(calls):
+    calls.fail = True
+    await resume_reply_plan("chat", 1, [10, 11], _ago(30), 2, PARTS)
+    assert calls == [("deliver", 1), ("abandon", 1, [10, 11]), ("stats", 1, 0)]
+
+
+async def test_exhausted_plan_is_abandoned_without_sending(calls):
+    await resume_reply_plan("chat", 1, [10, 11], _ago(30), 3, PARTS)
+    assert calls == [("abandon", 1, [10, 11]), ("stats", 1, 0)]
+
+
+async def test_stale_plan_is_abandoned_without_sending(calls):
+    await resume_reply_plan("chat", 1, [10, 11], _ago(3600), 0, PARTS)
+    assert calls == [("abandon", 1, [10, 11]), ("stats", 1, 0)]
+
+
+def _sent(message_id: str, text: str, at: datetime) -> dict:
+    return {
+        "key": {"remoteJid": "chat", "fromMe": True, "id": message_id},
+        "message": {"conversation": text},
+        "messageTimestamp": int(at.timestamp()),
+    }
+
+
+UNCERTAIN = [(0, "first", True, True), (1, "second", False, True), (2, "third", False, False)]
+
+
+async def test_attempted_part_already_sent_is_not_resent(calls):
+    calls.sent = [_sent("OTHER", "something else", _ago(5)), _sent("EVO2", "second", _ago(10))]
+    await resume_reply_plan("chat", 1, [10], _ago(30), 1, UNCERTAIN)
+
+    assert calls[:2] == [("lookup", "chat", True), ("delivered", 1, 1, "EVO2")]
+    assert calls.delivered_parts == [(0, "first", True), (1, "second", True), (2, "third", False)]
+
+
+async def test_attempted_part_not_found_is_sent(calls):
+    # Same text, but from before this plan existed
+    calls.sent = [_sent("OLD", "second", _ago(3600))]
+    await resume_reply_plan("chat", 1, [10], _ago(30), 1, UNCERTAIN)
+
+    assert calls == [("lookup", "chat", True), ("deliver", 1)]
+    assert calls.delivered_parts == [(0, "first", True), (1, "second", False), (2, "third", False)]
+
+
+async def test_failed_lookup_does_not_send(calls):
+    calls.lookup_error = RuntimeError("evolution down")
+    with pytest.raises(RuntimeError):
+        await resume_reply_plan("chat", 1, [10], _ago(30), 1, UNCERTAIN)
+    assert calls == [("lookup", "chat", True)]
@@ -0,0 +1,101 @@
+"""CompactSerializer round trips, fallbacks and compatibility with the default serializer."""
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from whatsapp_agent.graphs.whatsapp_bot import serde
+from whatsapp_agent.graphs.whatsapp_bot.serde import MESSAGES_TYPE, ZSTD_SUFFIX, CompactSerializer
+
+
+def _conversation() -> list:
+    return [
+        SystemMessage(content="be brief", id="s1"),
+        HumanMessage(content="hey, are we still on for tomorrow?", id="h1", name="Sara"),
+        AIMessage(
+            content="yes|||same place",
+            id="a1",
+            response_metadata={"model_name": "test-model", "finish_reason": "stop"},
+            usage_metadata={"input_tokens": 12, "output_tokens": 5, "total_tokens": 17},
+        ),
+        AIMessage(content="operator note", id="a2", additional_kwargs={"operator": True}),
+    ]
+
+
+def test_message_list_round_trip():
+    messages = _conversation()
+    serializer = CompactSerializer()
+    type_, data = serializer.dumps_typed(messages)
+
+    assert type_ == MESSAGES_TYPE
+    assert serializer.loads_typed((type_, data)) == messages
+
+
+def test_loads_checkpoints_written_by_default_serializer():
+    default = JsonPlusSerializer()
+    serializer = CompactSerializer()
+    values = [
+        _conversation(),
+        {"user_id": "971501234567@s.whatsapp.net", "messages": _conversation()},
+        "plain string",
+        None,
+    ]
+    for value in values:
+        assert serializer.loads_typed(default.dumps_typed(value)) == value
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        AIMessage(content="", id="a3", tool_calls=[{"name": "lookup", "args": {"q": "x"}, "id": "call-1"}]),
+        HumanMessage(content="hi", id="h2", example=True),
+        HumanMessage(content=[{"type": "text", "text": "hi"}], id="h3"),
+        ToolMessage(content="result", tool_call_id="call-1", id="t1"),
+    ],
+    ids=["tool_calls", "extra_field", "list_content", "other_type"],
+)
+def test_unencodable_messages_fall_back_losslessly(message):
+    messages = [HumanMessage(content="before", id="h0"), message]
+    serializer = CompactSerializer()
+    type_, data = serializer.dumps_typed(messages)
+
+    assert type_ != MESSAGES_TYPE
+    loaded = serializer.loads_typed((type_, data))
+    assert loaded == messages
+
+
+def test_non_primitive_metadata_falls_back():
+    message = AIMessage(content="ok", id="a4", response_metadata={"raw": {1, 2}})
+    serializer = CompactSerializer()
+    type_, data = serializer.dumps_typed([message])
+
+    assert type_ != MESSAGES_TYPE
+    assert serializer.loads_typed((type_, data)) == [message]
+
+
+def test_large_payload_compressed_round_trip():
+    messages = [HumanMessage(content=f"message number {i} " * 20, id=f"h{i}") for i in range(50)]
+    serializer = CompactSerializer(compress_min_bytes=1024)
+    type_, data = serializer.dumps_typed(messages)
+
+    assert type_ == MESSAGES_TYPE + ZSTD_SUFFIX
+    assert len(data) < len(serializer._dumps(messages)[1])
+    assert serializer.loads_typed((type_, data)) == messages
+
+
+def test_compression_disabled_below_threshold_or_with_zero():
+    messages = [HumanMessage(content="x" * 2000, id="h1")]
+    assert CompactSerializer(compress_min_bytes=4096).dumps_typed(messages)[0] == MESSAGES_TYPE
+    assert CompactSerializer(compress_min_bytes=0).dumps_typed(messages)[0] == MESSAGES_TYPE
+
+
+def test_compressed_checkpoint_without_zstandard_fails_clearly(monkeypatch):
+    messages = [HumanMessage(content="x" * 5000, id="h1")]
+    written = CompactSerializer(compress_min_bytes=1024).dumps_typed(messages)
+
+    monkeypatch.setattr(serde, "zstandard", None)
+    serializer = CompactSerializer(compress_min_bytes=1024)
+    # Writes stay uncompressed, reads of compressed payloads name the missing package
+    assert serializer.dumps_typed(messages)[0] == MESSAGES_TYPE
+    with pytest.raises(RuntimeError, match="zstandard"):
+        serializer.loads_typed(written)
@@ -0,0 +1,163 @@
+"""Speculator: cancelled by new messages, committed only for the exact batch, never written or sent early."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from whatsapp_agent.integrations import outbound_scheduler
+from whatsapp_agent.settings import settings
+from whatsapp_agent.workers import speculative
+from whatsapp_agent.workers.speculative import Speculator, speculation_stats
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _row(row_id: int, text: str = "hi") -> tuple[int, str, datetime, bool]:
+    return (row_id, text, START + timedelta(seconds=row_id), False)
+
+
+class FakeGraph:
+    """Thread state reads only; any write would be a checkpoint."""
+
+    def __init__(self):
+        self.writes = []
+
+    async def aget_state(self, config):
+        return SimpleNamespace(values={"messages": [HumanMessage(content="earlier", id="h0")]})
+
+    async def aupdate_state(self, *args, **kwargs):
+        self.writes.append(("aupdate_state", args))
+
+    async def ainvoke(self, *args, **kwargs):
+        self.writes.append(("ainvoke", args))
+
+
+class Model:
+    """Stub generate_reply: records prompts and blocks until released."""
+
+    def __init__(self):
+        self.prompts: list[list] = []
+        self.release = asyncio.Event()
+        self.cancelled = 0
+
+    async def generate_reply(self, messages):
+        self.prompts.append(messages)
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return AIMessage(content="speculated", id="ai1")
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = Model()
+    batch = [_row(1), _row(2)]
+
+    async def fetch_unprocessed_messages(chat_id):
+        return list(batch)
+
+    async def no_send(*args, **kwargs):
+        raise AssertionError("speculation must not send")
+
+    monkeypatch.setattr(speculative, "generate_reply", model.generate_reply)
+    monkeypatch.setattr(speculative, "fetch_unprocessed_messages", fetch_unprocessed_messages)
+    monkeypatch.setattr(outbound_scheduler, "send_text", no_send)
+    monkeypatch.setattr(outbound_scheduler, "set_typing", no_send)
+    monkeypatch.setattr(settings, "speculative_start_seconds", 2.0)
+    monkeypatch.setattr(speculative, "speculation_stats", type(speculation_stats)())
+    model.batch = batch
+    return model
+
+
+async def _started(graph: FakeGraph, model: Model) -> Speculator:
+    speculator = Speculator(graph, {"configurable": {"thread_id": "chat"}}, "chat")
+    await speculator.maybe_start(model.batch[-1][2], False, elapsed=2.5)
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert speculator.active
+    return speculator
+
+
+async def test_waits_for_the_pause_and_a_user_message(model):
+    speculator = Speculator(FakeGraph(), {}, "chat")
+    await speculator.maybe_start(START, False, elapsed=1.0)
+    await speculator.maybe_start(START, True, elapsed=5.0)
+    assert not speculator.active
+
+    model.batch.append((3, "operator", START, True))
+    await speculator.maybe_start(START, False, elapsed=5.0)
+    assert not speculator.active
+
+
+async def test_new_message_cancels_generation(model):
+    graph = FakeGraph()
+    speculator = await _started(graph, model)
+
+    # Same newest message: keep generating
+    speculator.observe(model.batch[-1][2])
+    assert speculator.active
+
+    speculator.observe(model.batch[-1][2] + timedelta(seconds=1))
+    await asyncio.sleep(0)
+    assert not speculator.active
+    assert model.cancelled == 1
+    assert speculative.speculation_stats.cancelled == 1
+    assert await speculator.take([*model.batch, _row(3)]) is None
+    assert graph.writes == []
+
+
+async def test_reply_is_committed_only_for_the_exact_batch(model):
+    graph = FakeGraph()
+    speculator = await _started(graph, model)
+    model.release.set()
+
+    assert await speculator.take(model.batch) == AIMessage(content="speculated", id="ai1")
+    assert [m.content for m in model.prompts[0]] == ["earlier", "hi", "hi"]
+    assert speculative.speculation_stats.hits == 1
+    # Generating and taking write nothing: the worker checkpoints and sends after take()
+    assert graph.writes == []
+
+
+@pytest.mark.parametrize(
+    "final_ids",
+    [[1, 2, 3], [1], [2, 1], [1, 3]],
+    ids=["grew", "shrank", "reordered", "replaced"],
+)
+async def test_any_other_batch_discards_the_reply(model, final_ids):
+    graph = FakeGraph()
+    speculator = await _started(graph, model)
+    model.release.set()
+
+    assert await speculator.take([_row(i) for i in final_ids]) is None
+    assert speculative.speculation_stats.discarded == 1
+    assert not speculator.active
+    assert graph.writes == []
+
+
+async def test_failed_generation_is_discarded(model, monkeypatch):
+    async def generate_reply(messages):
+        raise RuntimeError("model down")
+
+    monkeypatch.setattr(speculative, "generate_reply", generate_reply)
+    speculator = await _started(FakeGraph(), model)
+
+    assert await speculator.take(model.batch) is None
+    assert speculative.speculation_stats.discarded == 1
+
+
+async def test_cancel_drops_generation(model):
+    graph = FakeGraph()
+    speculator = await _started(graph, model)
+
+    speculator.cancel()
+    await asyncio.sleep(0)
+    assert not speculator.active
+    assert model.cancelled == 1
+    assert speculative.speculation_stats.discarded == 1
+    assert await speculator.take(model.batch) is None
+    assert graph.writes == []
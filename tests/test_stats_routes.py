@@ -0,0 +1,45 @@
+"""Stats routes are private: off without STATS_API_KEY, and require it when set."""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from whatsapp_agent.api import routes_stats
+from whatsapp_agent.settings import settings
+
+ROW = {
+    "chat_id": "971501234567@s.whatsapp.net",
+    "user_messages": 3,
+    "operator_messages": 1,
+    "replies": 2,
+    "reply_parts": 3,
+    "latency_count": 0,
+    "latency_sum_seconds": 0.0,
+    "latency_histogram": [],
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def get_chat_stats(chat_id):
+        return dict(ROW)
+
+    monkeypatch.setattr(routes_stats, "get_chat_stats", get_chat_stats)
+    app = FastAPI()
+    app.include_router(routes_stats.router)
+    return TestClient(app)
+
+
+def test_routes_are_off_without_a_key(client, monkeypatch):
+    monkeypatch.setattr(settings, "stats_api_key", None)
+    assert client.get(f"/stats/chats/{ROW['chat_id']}").status_code == 404
+
+
+def test_routes_require_the_key(client, monkeypatch):
+    monkeypatch.setattr(settings, "stats_api_key", "s3cret")
+    url = f"/stats/chats/{ROW['chat_id']}"
+
+    assert client.get(url).status_code == 401
+    assert client.get(url, headers={"X-API-Key": "wrong"}).status_code == 401
+    response = client.get(url, headers={"X-API-Key": "s3cret"})
+    assert response.status_code == 200 and response.json()["messages"] == 4